@@ -491,8 +491,9 @@ class AudioMonitor:
                 else:
                     avg_rms = current_rms
                 
-                # Обновляем текущий уровень
-                self.current_level = avg_rms
+                # Обновляем текущий уровень (Python float, чтобы get_lamp_status
+                # можно было сразу сериализовать в JSON)
+                self.current_level = float(avg_rms)
                 
                 # Вызываем колбэк обновления уровня
                 if self.on_level_updated_callback:
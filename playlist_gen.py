@@ -1,6 +1,28 @@
 import os
 import random
-from mutagen.mp3 import MP3
+from functools import lru_cache
+from mutagen.mp3 import MPEGInfo
+
+
+@lru_cache(maxsize=4096)
+def _read_track_duration(path, mtime_ns, size):
+    """
+    Возвращает длительность MP3 в секундах (mtime_ns и size — часть ключа кэша).
+    Читается только заголовок MPEG-потока (и Xing/VBRI для VBR): ID3-теги не разбираются,
+    а пропускаются по размеру из заголовка, поэтому обложки в тегах не читаются с диска.
+    """
+    with open(path, 'rb') as f:
+        return int(MPEGInfo(f).length)
+
+
+def get_track_duration(path):
+    """
+    Длительность трека в секундах. Результат кэшируется и переиспользуется,
+    пока у файла не изменились время модификации и размер.
+    Ошибки чтения/разбора файла пробрасываются вызывающему.
+    """
+    st = os.stat(path)
+    return _read_track_duration(path, st.st_mtime_ns, st.st_size)
 
 
 class PlaylistGenerator:
@@ -83,8 +105,7 @@ class PlaylistGenerator:
                 if track_history[folder]:
                     track = track_history[folder].pop(0)
                     try:
-                        audio = MP3(track)
-                        track_length = int(audio.info.length)
+                        track_length = get_track_duration(track)
                     except Exception as e:
                         print(f"Ошибка при получении информации о треке {track}: {e}")
                         continue
@@ -175,8 +196,7 @@ class PlaylistGenerator:
         for track in self.playlist:
             track_name = os.path.basename(track)
             try:
-                audio = MP3(track)
-                track_duration = int(audio.info.length)
+                track_duration = get_track_duration(track)
                 m3u_content += f"#EXTINF:{track_duration},{track_name}\n{track}\n"
             except Exception as e:
                 print(f"Ошибка при получении информации о треке {track}: {e}")
@@ -204,8 +224,7 @@ class PlaylistGenerator:
         total_duration = 0
         for track in self.playlist:
             try:
-                audio = MP3(track)
-                total_duration += int(audio.info.length)
+                total_duration += get_track_duration(track)
             except:
                 continue
         
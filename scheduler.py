@@ -8,6 +8,7 @@
 import os
 import sys
 import json
+import logging
 import time as time_module
 from datetime import datetime, time, timedelta
 from threading import Lock, Thread
@@ -154,12 +155,13 @@ class DiscoScheduler:
             try:
                 # Загружаем существующие настройки, чтобы не потерять другие данные
                 existing_settings = {}
-                if os.path.exists(self.config_file):
-                    try:
-                        with open(self.config_file, 'r', encoding='utf-8') as f:
-                            existing_settings = json.load(f)
-                    except Exception as e:
-                        self.log(f'Ошибка загрузки существующих настроек: {e}')
+                try:
+                    with open(self.config_file, 'r', encoding='utf-8') as f:
+                        existing_settings = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    self.log(f'Ошибка загрузки существующих настроек: {e}')
                 
                 # Обновляем настройки планировщика
                 if 'scheduled_days' in settings:
@@ -243,7 +245,8 @@ class DiscoScheduler:
     def check_schedule(self):
         """
         Проверяет, нужно ли запустить задачу.
-        Вызывается каждую секунду для проверки расписания.
+        Вызывается циклом сервера в начале каждой минуты, а во время
+        дискотеки — раз в VLC_WATCHDOG_INTERVAL секунд (сторожевая проверка VLC).
 
         Returns:
             dict: Информация о выполненных действиях
@@ -414,14 +417,16 @@ class DiscoScheduler:
                         return False
                 # Устанавливаем флаг активности дискотеки
                 self.disco_is_active = True
+                started_at = datetime.now()
                 # Сбрасываем флаг автоматического закрытия (при запуске дискотеки)
                 self.is_automatic_close = True
                 # Отправляем уведомление о начале дискотеки в отдельном потоке (чтобы не блокировать запуск музыки)
                 def _send_notification():
                     try:
                         self.log(f'📱 Отправка уведомления в ВК с плейлистом ({len(playlist)} треков)...')
-                        self.telegram_bot.notify_disco_started(playlist=playlist, start_time=self.start_time)
-                        self.log(f'✅ Уведомление с плейлистом отправлено в ВК')
+                        self.telegram_bot.notify_disco_started(playlist=playlist, start_time=self.start_time,
+                                                              now=started_at)
+                        self.log(f'✅ Уведомление с плейлистом поставлено в очередь ВК')
                     except Exception as e:
                         self.log(f'⚠️ Ошибка отправки ВК уведомления: {e}')
                 Thread(target=_send_notification, daemon=True).start()
@@ -502,9 +507,10 @@ class DiscoScheduler:
             if closed_count > 0:
                 # Отправляем уведомление о завершении дискотеки только если это автоматическое закрытие
                 if send_notification and is_automatic:
+                    closed_at = datetime.now()
                     def _send_stop_notification():
                         try:
-                            self.telegram_bot.notify_disco_stopped()
+                            self.telegram_bot.notify_disco_stopped(now=closed_at)
                         except Exception as e:
                             self.log(f'⚠️ Ошибка отправки ВК уведомления: {e}')
                     Thread(target=_send_stop_notification, daemon=True).start()
@@ -544,12 +550,13 @@ class DiscoScheduler:
             try:
                 # Загружаем существующие настройки
                 existing_settings = {}
-                if os.path.exists(self.config_file):
-                    try:
-                        with open(self.config_file, 'r', encoding='utf-8') as f:
-                            existing_settings = json.load(f)
-                    except Exception as e:
-                        self.log(f'Ошибка загрузки существующих настроек: {e}')
+                try:
+                    with open(self.config_file, 'r', encoding='utf-8') as f:
+                        existing_settings = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    self.log(f'Ошибка загрузки существующих настроек: {e}')
                 
                 # Обновляем только состояние планировщика
                 existing_settings['scheduler_enabled'] = bool(self.scheduler_enabled)
@@ -590,49 +597,61 @@ class DiscoScheduler:
             'scheduler_enabled': self.scheduler_enabled
         }
     
-    def get_next_run(self):
+    def get_next_run_datetime(self):
         """
-        Вычисляет следующий запланированный запуск
+        Вычисляет время следующего запланированного запуска
         
         Returns:
-            dict: Информация о следующем запуске или None
+            datetime: Время следующего запуска или None
         """
         if not self.scheduled_days or not self.scheduler_enabled:
             return None
         
         now = datetime.now()
         
-        # Проверяем на сегодня
-        if now.weekday() in self.scheduled_days:
-            today_run = now.replace(hour=self.start_time.hour, 
-                                   minute=self.start_time.minute, 
-                                   second=0, 
-                                   microsecond=0)
-            if today_run > now:
-                return {
-                    'date': today_run.strftime('%d.%m.%Y'),
-                    'time': today_run.strftime('%H:%M'),
-                    'day_name': ['Понедельник', 'Вторник', 'Среда', 'Четверг', 
-                                'Пятница', 'Суббота', 'Воскресенье'][today_run.weekday()]
-                }
-        
-        # Ищем в следующие 7 дней
-        for days_ahead in range(1, 8):
+        # Проверяем сегодня и следующие 7 дней
+        for days_ahead in range(0, 8):
             check_date = now + timedelta(days=days_ahead)
             if check_date.weekday() in self.scheduled_days:
                 next_run = check_date.replace(hour=self.start_time.hour, 
                                              minute=self.start_time.minute, 
                                              second=0, 
                                              microsecond=0)
-                return {
-                    'date': next_run.strftime('%d.%m.%Y'),
-                    'time': next_run.strftime('%H:%M'),
-                    'day_name': ['Понедельник', 'Вторник', 'Среда', 'Четверг', 
-                                'Пятница', 'Суббота', 'Воскресенье'][next_run.weekday()]
-                }
+                if next_run > now:
+                    return next_run
         
         return None
     
+    def get_next_run(self):
+        """
+        Вычисляет следующий запланированный запуск
+        
+        Returns:
+            dict: Информация о следующем запуске или None
+        """
+        return self.format_next_run(self.get_next_run_datetime())
+    
+    @staticmethod
+    def format_next_run(next_run):
+        """
+        Преобразует datetime следующего запуска в словарь для API
+        
+        Args:
+            next_run: datetime следующего запуска или None
+            
+        Returns:
+            dict: Информация о следующем запуске или None
+        """
+        if next_run is None:
+            return None
+        
+        return {
+            'date': next_run.strftime('%d.%m.%Y'),
+            'time': next_run.strftime('%H:%M'),
+            'day_name': ['Понедельник', 'Вторник', 'Среда', 'Четверг', 
+                        'Пятница', 'Суббота', 'Воскресенье'][next_run.weekday()]
+        }
+    
     def get_current_track_info(self):
         """
         Получает информацию о текущем воспроизводимом треке.
@@ -867,6 +886,8 @@ class DiscoScheduler:
 
 def main():
     """Тестовая функция"""
+    # Сообщения ВК-бота пишутся через logging — выводим их в консоль
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     print("=== Планировщик дискотеки ===")
     
     scheduler = DiscoScheduler()
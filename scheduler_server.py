@@ -8,15 +8,21 @@
 
 import sys
 import os
-import json
-import time
+import queue
 import signal
 import socket
+import hashlib
+import logging
+import logging.handlers
 import subprocess
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, Response
+from functools import lru_cache
+import orjson
+from flask import Flask, request, jsonify, Response, send_from_directory, abort
+from flask.json.provider import JSONProvider
+from waitress import create_server
 from flask_cors import CORS
-from threading import Thread, Lock
+from threading import Thread, Lock, Event
 
 from scheduler import DiscoScheduler
 from soundcheck import SoundCheck
@@ -24,9 +30,66 @@ from soundcheck_v2 import SoundCheckV2
 from audio_monitor import AudioMonitor, get_audio_devices_list
 from cleanup_utils import cleanup_on_startup
 
+# Графики саундчека, которые разрешено отдавать через /graphs/
+SOUNDCHECK_GRAPH_FILES = ('soundcheck_graph.png', 'soundcheck_graph_v2.png')
 
+def read_json_body():
+    """
+    Разбирает тело запроса как JSON-объект без кэширования в request
+    
+    Returns:
+        dict: Данные запроса или None, если тело пустое/некорректное
+    """
+    data = request.get_json(cache=False, silent=True)
+    return data if isinstance(data, dict) else None
+
+
+# Страница-заглушка, если web_interface.html не найден
+FALLBACK_HTML_TEMPLATE = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Планировщик Дискотеки ВДНХ</title>
+    <meta charset="UTF-8">
+    <style>
+        body { font-family: Arial, sans-serif; margin: 40px; background: #ffb6c1; }
+        h1 { color: #ff1493; }
+        .info { background: white; padding: 20px; border-radius: 10px; margin: 20px 0; }
+    </style>
+</head>
+<body>
+    <h1>🎵 Планировщик Дискотеки ВДНХ</h1>
+    <div class="info">
+        <p><strong>Веб-интерфейс не найден!</strong></p>
+        <p>Путь к файлу: <code>{web_interface_path}</code></p>
+        <p>Убедитесь, что файл web_interface.html находится в директории сервера.</p>
+        <p>API доступно по адресу: <a href="/api/status">/api/status</a></p>
+    </div>
+</body>
+</html>
+"""
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON-провайдер Flask на основе orjson (используется в jsonify)"""
+
+    # numpy-скаляры от AudioMonitor и int-ключи сериализуются без преобразований
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=self.option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.option), mimetype='application/json')
+
+
+@lru_cache(maxsize=1)
 def get_exe_dir():
-    """Получает директорию где находится exe файл"""
+    """Получает директорию где находится exe файл (не меняется за время работы процесса)"""
     if getattr(sys, 'frozen', False):
         return os.path.dirname(sys.executable)
     else:
@@ -80,9 +143,21 @@ def get_local_ip():
 class DiscoServer:
     """Автономный сервер планировщика дискотеки"""
     
+    # Максимальная пауза цикла планировщика во время дискотеки (проверка, что VLC жив)
+    VLC_WATCHDOG_INTERVAL = 5
+    
     def __init__(self):
         self.config_file = os.path.join(get_exe_dir(), 'scheduler_config.json')
-        self.running = True
+        # Событие остановки: фоновые циклы ждут на нем вместо time.sleep
+        self._stop = Event()
+        # Остановка уже идет: повторный сигнал не должен прерывать очистку в start()
+        self._shutting_down = False
+        self._http_server = None  # WSGI-сервер waitress (создается в run_flask_server)
+        self._http_server_closed = False
+
+        # Логирование через очередь: вызывающие потоки только кладут запись,
+        # запись в stdout/файл выполняет отдельный поток
+        self._init_logging()
 
         # Очистка служебных файлов при запуске
         music_folder = os.path.join(get_exe_dir(), 'mp3')
@@ -90,17 +165,32 @@ class DiscoServer:
 
         # Lock для безопасной записи в конфиг из разных потоков
         self.config_lock = Lock()
+
+        # Кэш веб-интерфейса (bytes), перечитывается при изменении mtime файла
+        self.web_interface_path = os.path.join(get_exe_dir(), 'web_interface.html')
+        self._web_html = None
+        self._web_html_mtime = None
+        self._web_html_etag = None
+        # Страница-заглушка на случай отсутствия web_interface.html (путь не меняется)
+        self._fallback_html = FALLBACK_HTML_TEMPLATE.replace(
+            '{web_interface_path}', self.web_interface_path).encode('utf-8')
+
+        # Текущий эталонный саундчек: нужен, чтобы прервать его ожидание при остановке
+        self._soundcheck = None
+        # Переиспользуемый экземпляр саундчека V2 (создается при первом запуске)
+        self._soundcheck_v2 = None
+        self._soundcheck_lock = Lock()
         
         # Флаг автозапуска саундчека и время запуска до старта дискотеки
         self.soundcheck_schedule_enabled = False
         self.soundcheck_minutes_before_disco = 30  # по умолчанию 30 минут
         self.soundcheck_last_trigger_key = None  # защита от повторов на один и тот же запуск
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    cfg = json.load(f)
-                    self.soundcheck_schedule_enabled = bool(cfg.get('soundcheck_schedule_enabled', False))
-                    self.soundcheck_minutes_before_disco = int(cfg.get('soundcheck_minutes_before_disco', 30))
+            cfg = self._load_config_file()
+            self.soundcheck_schedule_enabled = bool(cfg.get('soundcheck_schedule_enabled', False))
+            self.soundcheck_minutes_before_disco = int(cfg.get('soundcheck_minutes_before_disco', 30))
+        except FileNotFoundError:
+            pass
         except Exception as e:
             # Не критично
             self.log(f"⚠️ Не удалось прочитать состояние автосаундчека из конфига: {e}")
@@ -118,6 +208,7 @@ class DiscoServer:
 
         # Инициализация Flask приложения
         self.app = Flask(__name__)
+        self.app.json = OrjsonProvider(self.app)
         CORS(self.app)
         self.setup_routes()
 
@@ -125,10 +216,32 @@ class DiscoServer:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
     
+    def _init_logging(self):
+        """Настройка логгера с QueueHandler/QueueListener"""
+        formatter = logging.Formatter('[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+        file_handler = logging.handlers.RotatingFileHandler(
+            os.path.join(get_exe_dir(), 'disco.log'),
+            maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+
+        self._log_queue = queue.Queue(-1)
+        self._log_listener = logging.handlers.QueueListener(
+            self._log_queue, stream_handler, file_handler, respect_handler_level=True
+        )
+        self._log_listener.start()
+
+        self.logger = logging.getLogger('disco')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.handlers = [logging.handlers.QueueHandler(self._log_queue)]
+
     def log(self, message):
-        """Логирование с timestamp"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f'[{timestamp}] {message}')
+        """Логирование с timestamp (timestamp добавляет formatter)"""
+        self.logger.info(message)
     
     def init_audio_monitor(self):
         """Инициализация мониторинга звука"""
@@ -196,9 +309,9 @@ class DiscoServer:
         # Отправляем уведомление если сейчас время дискотеки по расписанию
         if self.scheduler.is_disco_scheduled_now():
             try:
-                result = self.scheduler.telegram_bot.notify_music_restored(silence_time)
+                result = self.scheduler.telegram_bot.notify_music_restored()
                 if result:
-                    self.log(f"✅ Уведомление о восстановлении отправлено в ВК")
+                    self.log(f"✅ Уведомление о восстановлении поставлено в очередь ВК")
                 else:
                     self.log(f"ℹ️ Уведомление о восстановлении не отправлено")
             except Exception as e:
@@ -216,7 +329,7 @@ class DiscoServer:
                 self.log(f"📱 Отправка уведомления о тишине в ВК...")
                 result = self.scheduler.telegram_bot.notify_music_stopped(silence_time)
                 if result:
-                    self.log(f"✅ Уведомление о тишине отправлено в ВК")
+                    self.log(f"✅ Уведомление о тишине поставлено в очередь ВК")
                 else:
                     self.log(f"❌ Уведомление не отправлено (бот не активирован или уведомления отключены)")
             except Exception as e:
@@ -229,6 +342,19 @@ class DiscoServer:
         """Обработчик обновления уровня звука (без вывода в лог, чтобы не засорять)"""
         pass
     
+    def _load_config_file(self):
+        """
+        Читает конфиг через orjson
+        
+        Returns:
+            dict: Содержимое scheduler_config.json
+        
+        Raises:
+            FileNotFoundError: Если конфига еще нет
+        """
+        with open(self.config_file, 'rb') as f:
+            return orjson.loads(f.read())
+    
     def _safe_update_config(self, updates):
         """
         Безопасное обновление конфига с блокировкой
@@ -239,18 +365,18 @@ class DiscoServer:
         with self.config_lock:
             try:
                 # Загружаем существующие настройки
-                existing_settings = {}
-                if os.path.exists(self.config_file):
-                    with open(self.config_file, 'r', encoding='utf-8') as f:
-                        existing_settings = json.load(f)
+                try:
+                    existing_settings = self._load_config_file()
+                except FileNotFoundError:
+                    existing_settings = {}
                 
                 # Применяем обновления
                 existing_settings.update(updates)
                 
                 # Создаем временный файл для атомарной записи
                 temp_file = self.config_file + '.tmp'
-                with open(temp_file, 'w', encoding='utf-8') as f:
-                    json.dump(existing_settings, f, ensure_ascii=False, indent=2)
+                with open(temp_file, 'wb') as f:
+                    f.write(orjson.dumps(existing_settings, option=orjson.OPT_INDENT_2))
                 
                 # Атомарно заменяем файл
                 os.replace(temp_file, self.config_file)
@@ -267,66 +393,61 @@ class DiscoServer:
                         pass
                 return False
     
-    def _save_monitoring_enabled_to_config(self, enabled):
-        """Сохраняет состояние мониторинга в конфиг"""
-        try:
-            success = self._safe_update_config({'monitoring_enabled': enabled})
-            if success:
-                self.log(f"💾 Состояние мониторинга сохранено в конфиг: {'включен' if enabled else 'отключен'}")
-        except Exception as e:
-            self.log(f"❌ Ошибка сохранения состояния мониторинга: {e}")
-    
-    def _save_audio_settings_to_config(self):
-        """Сохраняет настройки аудио мониторинга в конфиг"""
-        try:
-            # Подготавливаем обновления
-            updates = {}
-            if self.audio_monitor:
-                updates['audio_threshold'] = float(self.audio_monitor.threshold)
-                updates['audio_silence_duration'] = int(self.audio_monitor.silence_duration)
-                updates['audio_sound_confirmation_duration'] = int(self.audio_monitor.sound_confirmation_duration)
-                updates['audio_buffer_size'] = int(self.audio_monitor.buffer_size)
-                if self.audio_monitor.device_index is not None:
-                    updates['audio_device_index'] = int(self.audio_monitor.device_index)
-            
-            success = self._safe_update_config(updates)
-            if success:
-                self.log("💾 Настройки аудио мониторинга сохранены в конфиг")
-        except Exception as e:
-            self.log(f"❌ Ошибка сохранения настроек аудио мониторинга: {e}")
-    
-    def _save_soundcheck_schedule_enabled_to_config(self, enabled):
-        """Сохраняет состояние автосаундчека в конфиг"""
-        try:
-            success = self._safe_update_config({'soundcheck_schedule_enabled': bool(enabled)})
-            if success:
-                self.log(f"💾 Авто-саундчек по расписанию: {'включен' if enabled else 'отключен'}")
-        except Exception as e:
-            self.log(f"❌ Ошибка сохранения состояния авто-саундчека: {e}")
-    
-    def _save_soundcheck_minutes_to_config(self, minutes):
-        """Сохраняет количество минут до запуска саундчека в конфиг"""
-        try:
-            success = self._safe_update_config({'soundcheck_minutes_before_disco': int(minutes)})
-            if success:
-                self.log(f"💾 Авто-саундчек: за {minutes} минут до дискотеки")
-        except Exception as e:
-            self.log(f"❌ Ошибка сохранения времени авто-саундчека: {e}")
+    def _save_config_keys(self, updates, log_msg=None):
+        """
+        Сохраняет набор ключей в конфиг одной записью
+        
+        Args:
+            updates (dict): Ключи и значения для сохранения
+            log_msg (str): Сообщение для лога при успешном сохранении
+        """
+        if self._safe_update_config(updates) and log_msg:
+            self.log(log_msg)
     
-    def _save_soundcheck_duration_to_config(self, duration):
-        """Сохраняет длительность саундчека в конфиг"""
+    def _audio_settings_updates(self):
+        """Собирает текущие настройки аудио мониторинга для записи в конфиг"""
+        updates = {
+            'audio_threshold': float(self.audio_monitor.threshold),
+            'audio_silence_duration': int(self.audio_monitor.silence_duration),
+            'audio_sound_confirmation_duration': int(self.audio_monitor.sound_confirmation_duration),
+            'audio_buffer_size': int(self.audio_monitor.buffer_size),
+        }
+        if self.audio_monitor.device_index is not None:
+            updates['audio_device_index'] = int(self.audio_monitor.device_index)
+        return updates
+
+    def _get_web_interface_html(self):
+        """
+        Возвращает содержимое web_interface.html из кэша в памяти
+        
+        Returns:
+            bytes: Содержимое файла или None если файл не найден
+        """
         try:
-            success = self._safe_update_config({'soundcheck_duration_seconds': int(duration)})
-            if success:
-                self.log(f"💾 Длительность саундчека: {duration} секунд")
-        except Exception as e:
-            self.log(f"❌ Ошибка сохранения длительности саундчека: {e}")
+            mtime = os.path.getmtime(self.web_interface_path)
+        except OSError:
+            self._web_html = None
+            self._web_html_mtime = None
+            self._web_html_etag = None
+            return None
+        
+        if self._web_html is None or mtime != self._web_html_mtime:
+            with open(self.web_interface_path, 'rb') as f:
+                self._web_html = f.read()
+            self._web_html_mtime = mtime
+            self._web_html_etag = hashlib.sha1(self._web_html).hexdigest()
+            self.log(f"✅ Веб-интерфейс Hello Kitty загружен в кэш: {self.web_interface_path}")
+        return self._web_html
 
     def run_soundcheck_and_notify(self):
         """Запуск саундчека V2, расчет схожести и отправка в ВК при необходимости"""
-        sc2 = SoundCheckV2(audio_monitor=self.audio_monitor)
-        sc2.run_soundcheck()
-        similarity = sc2.compare_with_previous()
+        # Экземпляр общий, поэтому одновременно выполняется только один саундчек
+        with self._soundcheck_lock:
+            if self._soundcheck_v2 is None:
+                self._soundcheck_v2 = SoundCheckV2(audio_monitor=self.audio_monitor)
+            sc2 = self._soundcheck_v2
+            sc2.run_soundcheck()
+            similarity = sc2.compare_with_previous()
         similarity = float(similarity) if similarity is not None else None
         verdict = None
         if similarity is not None:
@@ -437,10 +558,10 @@ class DiscoServer:
             
             # Загружаем дополнительные настройки из конфига
             try:
-                if os.path.exists(self.config_file):
-                    with open(self.config_file, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                        settings['soundcheck_duration_seconds'] = config.get('soundcheck_duration_seconds', 10)
+                config = self._load_config_file()
+                settings['soundcheck_duration_seconds'] = config.get('soundcheck_duration_seconds', 10)
+            except FileNotFoundError:
+                settings['soundcheck_duration_seconds'] = 10
             except Exception as e:
                 self.log(f"⚠️ Ошибка загрузки настроек саундчека из конфига: {e}")
                 settings['soundcheck_duration_seconds'] = 10
@@ -460,7 +581,9 @@ class DiscoServer:
         @self.app.route('/api/settings', methods=['POST'])
         def update_settings():
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 
                 # Обновляем настройки планировщика
                 settings = {}
@@ -504,7 +627,8 @@ class DiscoServer:
                     
                     # Сохраняем аудио настройки в конфиг если они изменились
                     if audio_settings_updated:
-                        self._save_audio_settings_to_config()
+                        self._save_config_keys(self._audio_settings_updates(),
+                                               "💾 Настройки аудио мониторинга сохранены в конфиг")
                     
                     # Обновляем состояние мониторинга, если оно изменилось
                     if 'monitoring_enabled' in data:
@@ -524,7 +648,10 @@ class DiscoServer:
                                 self.log("⏹️ Мониторинг звука остановлен через API")
                             
                             # Сохраняем состояние в конфиг
-                            self._save_monitoring_enabled_to_config(new_monitoring_enabled)
+                            self._save_config_keys(
+                                {'monitoring_enabled': new_monitoring_enabled},
+                                f"💾 Состояние мониторинга сохранено в конфиг: {'включен' if new_monitoring_enabled else 'отключен'}"
+                            )
                 
                 return jsonify({'success': True, 'message': 'Настройки обновлены'})
             except Exception as e:
@@ -536,9 +663,6 @@ class DiscoServer:
             try:
                 if self.audio_monitor:
                     status = self.audio_monitor.get_lamp_status()
-                    # Преобразуем float32 в обычный float для JSON сериализации
-                    if 'audio_level' in status:
-                        status['audio_level'] = float(status['audio_level'])
                     status['disco_is_active'] = self.scheduler.disco_is_active
                     return jsonify(status)
                 else:
@@ -588,7 +712,10 @@ class DiscoServer:
                     enabled = self.audio_monitor.toggle_monitoring()
                     
                     # Сохраняем состояние в конфиг
-                    self._save_monitoring_enabled_to_config(enabled)
+                    self._save_config_keys(
+                        {'monitoring_enabled': enabled},
+                        f"💾 Состояние мониторинга сохранено в конфиг: {'включен' if enabled else 'отключен'}"
+                    )
                     
                     # Если мониторинг включен, запускаем его
                     if enabled and not self.audio_monitor.is_monitoring:
@@ -739,7 +866,9 @@ class DiscoServer:
         def set_volume():
             """Установка громкости"""
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 volume = data.get('volume', 100)
                 
                 # Проверяем диапазон громкости
@@ -759,7 +888,11 @@ class DiscoServer:
             """Запуск эталонного саундчека (создает образец и график)"""
             try:
                 sc = SoundCheck(audio_monitor=self.audio_monitor)
-                ok = sc.run_soundcheck()
+                self._soundcheck = sc
+                try:
+                    ok = sc.run_soundcheck()
+                finally:
+                    self._soundcheck = None
                 return jsonify({'success': bool(ok), 'message': 'Эталонный саундчек выполнен' if ok else 'Ошибка выполнения саундчека'})
             except Exception as e:
                 return jsonify({'success': False, 'message': str(e)})
@@ -778,7 +911,10 @@ class DiscoServer:
             """Переключение состояния автосаундчека"""
             try:
                 self.soundcheck_schedule_enabled = not self.soundcheck_schedule_enabled
-                self._save_soundcheck_schedule_enabled_to_config(self.soundcheck_schedule_enabled)
+                self._save_config_keys(
+                    {'soundcheck_schedule_enabled': bool(self.soundcheck_schedule_enabled)},
+                    f"💾 Авто-саундчек по расписанию: {'включен' if self.soundcheck_schedule_enabled else 'отключен'}"
+                )
                 status = 'включен' if self.soundcheck_schedule_enabled else 'отключен'
                 self.log(f"🔁 Авто-саундчек {status}")
                 return jsonify({'success': True, 'enabled': self.soundcheck_schedule_enabled})
@@ -789,7 +925,9 @@ class DiscoServer:
         def update_soundcheck_minutes():
             """Обновление количества минут до запуска саундчека"""
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 minutes = data.get('minutes', 30)
                 
                 # Проверяем диапазон минут
@@ -797,7 +935,10 @@ class DiscoServer:
                     return jsonify({'success': False, 'message': 'Минуты должны быть от 1 до 120'})
                 
                 self.soundcheck_minutes_before_disco = int(minutes)
-                self._save_soundcheck_minutes_to_config(minutes)
+                self._save_config_keys(
+                    {'soundcheck_minutes_before_disco': int(minutes)},
+                    f"💾 Авто-саундчек: за {minutes} минут до дискотеки"
+                )
                 
                 return jsonify({'success': True, 'minutes': minutes})
             except Exception as e:
@@ -807,14 +948,19 @@ class DiscoServer:
         def update_soundcheck_duration():
             """Обновление длительности саундчека в секундах"""
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 duration = data.get('duration', 10)
                 
                 # Проверяем диапазон секунд
                 if not isinstance(duration, (int, float)) or duration < 1 or duration > 60:
                     return jsonify({'success': False, 'message': 'Длительность должна быть от 1 до 60 секунд'})
                 
-                self._save_soundcheck_duration_to_config(duration)
+                self._save_config_keys(
+                    {'soundcheck_duration_seconds': int(duration)},
+                    f"💾 Длительность саундчека: {duration} секунд"
+                )
                 
                 return jsonify({'success': True, 'duration': duration})
             except Exception as e:
@@ -824,15 +970,13 @@ class DiscoServer:
         def get_soundcheck_schedule_status():
             """Статус автосаундчека и ближайшее время срабатывания"""
             try:
-                next_info = self.scheduler.get_next_run()
+                # Один проход по расписанию: словарь и время срабатывания из одного datetime
+                next_dt = self.scheduler.get_next_run_datetime()
+                next_info = self.scheduler.format_next_run(next_dt)
                 next_trigger = None
-                if next_info and 'date' in next_info and 'time' in next_info:
-                    try:
-                        dt = datetime.strptime(f"{next_info['date']} {next_info['time']}", "%d.%m.%Y %H:%M")
-                        trig = dt - timedelta(minutes=self.soundcheck_minutes_before_disco)
-                        next_trigger = trig.strftime("%d.%m.%Y %H:%M")
-                    except Exception:
-                        next_trigger = None
+                if next_dt is not None:
+                    trig = next_dt - timedelta(minutes=self.soundcheck_minutes_before_disco)
+                    next_trigger = trig.strftime("%d.%m.%Y %H:%M")
                 return jsonify({
                     'enabled': self.soundcheck_schedule_enabled,
                     'minutes_before_disco': self.soundcheck_minutes_before_disco,
@@ -875,7 +1019,9 @@ class DiscoServer:
         def set_config():
             """Установка конкретной конфигурации"""
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 config_name = data.get('config_name')
 
                 if config_name not in ['zhenya', 'ruslan']:
@@ -916,7 +1062,9 @@ class DiscoServer:
         def save_config_content():
             """Сохранение содержимого конфигурационного файла"""
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 config_name = data.get('name')
                 content = data.get('content')
 
@@ -954,16 +1102,18 @@ class DiscoServer:
                     return jsonify({'success': False, 'message': 'Папка mp3 не найдена'})
 
                 folders = []
-                for item in os.listdir(mp3_dir):
-                    item_path = os.path.join(mp3_dir, item)
-                    if os.path.isdir(item_path):
-                        # Подсчитываем количество mp3 файлов
-                        mp3_count = len([f for f in os.listdir(item_path) if f.lower().endswith('.mp3')])
-                        folders.append({
-                            'name': item,
-                            'path': item_path,
-                            'mp3_count': mp3_count
-                        })
+                # os.scandir: тип записи берется из самого каталога, без отдельного stat на каждую
+                with os.scandir(mp3_dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir():
+                            # Подсчитываем количество mp3 файлов
+                            with os.scandir(entry.path) as folder_entries:
+                                mp3_count = sum(1 for f in folder_entries if f.name.lower().endswith('.mp3'))
+                            folders.append({
+                                'name': entry.name,
+                                'path': entry.path,
+                                'mp3_count': mp3_count
+                            })
 
                 folders.sort(key=lambda x: x['name'])
                 return jsonify({'success': True, 'folders': folders})
@@ -983,15 +1133,16 @@ class DiscoServer:
                     return jsonify({'success': False, 'message': 'Папка не найдена'})
 
                 files = []
-                for item in os.listdir(folder_path):
-                    if item.lower().endswith('.mp3'):
-                        item_path = os.path.join(folder_path, item)
-                        file_size = os.path.getsize(item_path)
-                        files.append({
-                            'name': item,
-                            'size': file_size,
-                            'size_mb': round(file_size / (1024 * 1024), 2)
-                        })
+                # Размер берем из DirEntry.stat() (кэшируется, на Windows — без отдельного системного вызова)
+                with os.scandir(folder_path) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith('.mp3'):
+                            file_size = entry.stat().st_size
+                            files.append({
+                                'name': entry.name,
+                                'size': file_size,
+                                'size_mb': round(file_size / (1024 * 1024), 2)
+                            })
 
                 files.sort(key=lambda x: x['name'])
                 return jsonify({'success': True, 'files': files, 'folder': folder_name})
@@ -1002,7 +1153,9 @@ class DiscoServer:
         def delete_mp3_file():
             """Удаление mp3 файла"""
             try:
-                data = request.get_json()
+                data = read_json_body()
+                if data is None:
+                    return jsonify({'success': False, 'message': 'Ожидается JSON-объект в теле запроса'})
                 folder_name = data.get('folder')
                 file_name = data.get('file')
 
@@ -1054,44 +1207,29 @@ class DiscoServer:
         def serve_web_interface():
             """Обслуживание веб-интерфейса"""
             try:
-                web_interface_path = os.path.join(get_exe_dir(), 'web_interface.html')
-                self.log(f"🔍 Поиск веб-интерфейса: {web_interface_path}")
-                self.log(f"📁 Файл существует: {os.path.exists(web_interface_path)}")
-
-                if os.path.exists(web_interface_path):
-                    self.log("✅ Загружаем веб-интерфейс Hello Kitty")
-                    with open(web_interface_path, 'r', encoding='utf-8') as f:
-                        return Response(f.read(), mimetype='text/html')
+                web_html = self._get_web_interface_html()
+
+                if web_html is not None:
+                    # ETag/Last-Modified: повторные запросы браузера получают 304 без тела
+                    response = Response(web_html, mimetype='text/html')
+                    response.set_etag(self._web_html_etag)
+                    response.last_modified = self._web_html_mtime
+                    response.cache_control.no_cache = True
+                    return response.make_conditional(request)
                 else:
                     self.log("⚠️ Веб-интерфейс не найден, показываем fallback")
-                    fallback_html = f"""
-                    <!DOCTYPE html>
-                    <html>
-                    <head>
-                        <title>Планировщик Дискотеки ВДНХ</title>
-                        <meta charset="UTF-8">
-                        <style>
-                            body {{ font-family: Arial, sans-serif; margin: 40px; background: #ffb6c1; }}
-                            h1 {{ color: #ff1493; }}
-                            .info {{ background: white; padding: 20px; border-radius: 10px; margin: 20px 0; }}
-                        </style>
-                    </head>
-                    <body>
-                        <h1>🎵 Планировщик Дискотеки ВДНХ</h1>
-                        <div class="info">
-                            <p><strong>Веб-интерфейс не найден!</strong></p>
-                            <p>Путь к файлу: <code>{web_interface_path}</code></p>
-                            <p>Убедитесь, что файл web_interface.html находится в директории сервера.</p>
-                            <p>API доступно по адресу: <a href="/api/status">/api/status</a></p>
-                        </div>
-                    </body>
-                    </html>
-                    """
-                    return Response(fallback_html, mimetype='text/html', status=404)
+                    return Response(self._fallback_html, mimetype='text/html; charset=utf-8', status=404)
             except Exception as e:
                 self.log(f"❌ Ошибка загрузки веб-интерфейса: {str(e)}")
                 return Response(f"Ошибка загрузки веб-интерфейса: {str(e)}", mimetype='text/plain', status=500)
 
+        @self.app.route('/graphs/<path:name>', methods=['GET'])
+        def serve_soundcheck_graph(name):
+            """Отдача графиков саундчека (sendfile + If-Modified-Since/ETag/Range)"""
+            if name not in SOUNDCHECK_GRAPH_FILES:
+                abort(404)
+            return send_from_directory(get_exe_dir(), name, conditional=True, etag=True, max_age=0)
+
         @self.app.route('/admin', methods=['GET'])
         def serve_admin_interface():
             """Обслуживание интерфейса администрирования"""
@@ -1159,7 +1297,7 @@ class DiscoServer:
         """Основной цикл проверки расписания"""
         self.log("✅ Цикл планировщика запущен")
         
-        while self.running:
+        while not self._stop.is_set():
             try:
                 # Проверяем расписание
                 self.scheduler.check_schedule()
@@ -1169,11 +1307,11 @@ class DiscoServer:
 
                 # Автоматический саундчек за настроенное количество минут до старта дискотеки
                 if self.soundcheck_schedule_enabled:
-                    next_info = self.scheduler.get_next_run()
-                    if next_info and 'date' in next_info and 'time' in next_info:
+                    dt = self.scheduler.get_next_run_datetime()
+                    if dt is not None:
                         try:
-                            next_key = f"{next_info['date']} {next_info['time']}"
-                            dt = datetime.strptime(next_key, "%d.%m.%Y %H:%M")
+                            # Ключ срабатывания — само время ближайшего запуска
+                            next_key = dt
                             trigger_dt = dt - timedelta(minutes=self.soundcheck_minutes_before_disco)
                             now = datetime.now()
                             # Строго один запуск на одно ближайшее срабатывание
@@ -1193,12 +1331,30 @@ class DiscoServer:
                             # Не критично для основного цикла
                             self.log(f"⚠️ Ошибка расчета времени автосаундчека: {pe}")
                 
-                # Спим секунду
-                time.sleep(1)
+                # Ждем до начала следующей минуты (во время дискотеки — не дольше
+                # VLC_WATCHDOG_INTERVAL) или до сигнала остановки
+                self._stop.wait(self._scheduler_sleep_seconds())
                 
             except Exception as e:
                 self.log(f"❌ Ошибка в цикле планировщика: {e}")
-                time.sleep(1)
+                self._stop.wait(1)
+    
+    def _scheduler_sleep_seconds(self):
+        """
+        Вычисляет паузу до следующей итерации цикла планировщика
+        
+        Время запуска, остановки и автосаундчека задается с точностью до минуты,
+        поэтому достаточно просыпаться в начале каждой минуты. Во время дискотеки
+        пауза ограничена VLC_WATCHDOG_INTERVAL, чтобы быстро перезапускать VLC.
+        
+        Returns:
+            float: Пауза в секундах (от 0.5 до 60)
+        """
+        now = datetime.now()
+        sleep_s = 60 - now.second - now.microsecond / 1_000_000
+        if self.scheduler.disco_is_active:
+            sleep_s = min(sleep_s, self.VLC_WATCHDOG_INTERVAL)
+        return max(0.5, min(60, sleep_s))
     
     def run_flask_server(self):
         """Запуск Flask сервера"""
@@ -1207,10 +1363,36 @@ class DiscoServer:
             self.log(f'🌐 Веб-сервер запущен: http://{server_ip}:5002')
             self.log(f'🎀 Веб-интерфейс Hello Kitty: http://{server_ip}:5002/')
             self.log(f'📡 API документация: http://{server_ip}:5002/api/status')
-            self.app.run(host='0.0.0.0', port=5002, debug=False, use_reloader=False)
+            # waitress: пул из 8 потоков, чтобы долгие вызовы (саундчек, git pull)
+            # не блокировали опрос статуса из веб-интерфейса
+            self._http_server = create_server(self.app, host='0.0.0.0', port=5002,
+                                              threads=8, channel_timeout=30)
+            try:
+                # Сигнал мог прийти до создания сервера — тогда цикл не запускаем
+                if not self._stop.is_set():
+                    self._http_server.run()
+            finally:
+                # Освобождаем порт, чтобы перезапуск мог сразу его занять
+                self._close_http_server()
+                # Дожидаемся рабочих потоков waitress, обрабатывающих запросы
+                self._http_server.task_dispatcher.shutdown()
         except Exception as e:
             self.log(f'❌ Ошибка веб-сервера: {str(e)}')
     
+    def _close_http_server(self):
+        """
+        Закрывает слушающий сокет и открытые соединения waitress:
+        цикл run() остается без каналов и возвращается
+        """
+        server = self._http_server
+        if server is None or self._http_server_closed:
+            return
+        self._http_server_closed = True
+        server.close()
+        # Keep-alive соединения иначе держали бы цикл до channel_timeout
+        for channel in list(server._map.values()):
+            channel.close()
+    
     def start(self):
         """Запуск сервера"""
         self.log("=" * 60)
@@ -1231,7 +1413,7 @@ class DiscoServer:
         if self.scheduler.telegram_bot and self.scheduler.telegram_bot.enabled and self.scheduler.telegram_bot.notifications_enabled:
             try:
                 self.scheduler.telegram_bot.notify_server_started()
-                self.log("📱 Уведомление о перезагрузке сервера отправлено в ВК")
+                self.log("📱 Уведомление о перезагрузке сервера поставлено в очередь ВК")
             except Exception as e:
                 self.log(f'⚠️ Ошибка отправки ВК уведомления о перезагрузке: {e}')
 
@@ -1239,21 +1421,46 @@ class DiscoServer:
         scheduler_thread = Thread(target=self.run_scheduler_loop, daemon=True)
         scheduler_thread.start()
         
-        # Запускаем Flask сервер (блокирующий вызов)
-        self.run_flask_server()
+        # Запускаем Flask сервер (блокирующий вызов, возвращается после сигнала остановки)
+        try:
+            self.run_flask_server()
+        finally:
+            self._shutting_down = True
+            self.stop_soundchecks()
+            self._stop.set()
+            scheduler_thread.join(timeout=5)
+            # Досылаем уведомления, оставшиеся в очереди ВК-бота
+            if self.scheduler.telegram_bot:
+                self.scheduler.telegram_bot.close(timeout=5)
+            self.log("✅ Все компоненты остановлены")
+            # Дописываем накопленные в очереди записи лога перед выходом
+            self._log_listener.stop()
+    
+    def stop_soundchecks(self):
+        """Прерывает ожидание идущего саундчека, чтобы поток планировщика не висел до конца замера"""
+        for sc in (self._soundcheck, self._soundcheck_v2):
+            if sc is not None:
+                sc.stop()
     
     def signal_handler(self, signum, frame):
         """Обработчик сигналов завершения"""
+        if self._shutting_down:
+            # Остановка уже идет: не прерываем очистку (досылку ВК, запись лога)
+            self._stop.set()
+            return
+        self._shutting_down = True
         self.log("\n🛑 Получен сигнал завершения, останавливаем сервер...")
-        self.running = False
+        self.stop_soundchecks()
+        self._stop.set()
         
         # Корректно завершаем мониторинг звука
         if self.audio_monitor:
             self.audio_monitor.cleanup()
         
-        # Принудительно завершаем процесс (Flask может держать поток)
-        self.log("✅ Все компоненты остановлены, завершаем процесс...")
-        os._exit(0)
+        # Останавливаем waitress через его триггер: сокеты закрываются внутри цикла
+        # в безопасной точке, после чего run() возвращается в start()
+        if self._http_server is not None:
+            self._http_server.trigger.pull_trigger(self._close_http_server)
 
 
 def main():
@@ -9,12 +9,15 @@ import os
 import sys
 import time
 import json
+import threading
+from collections import deque
 from pathlib import Path
+import orjson
 import matplotlib
 # Используем безоконный backend, чтобы работать из серверных потоков
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
 from datetime import datetime
 import numpy as np
 
@@ -34,6 +37,18 @@ def get_exe_dir():
 class SoundCheck:
     """Класс для запуска саундчека"""
     
+    # Начальная емкость буферов данных (удваивается при заполнении)
+    SAMPLES_INITIAL_CAPACITY = 4096
+    
+    # Если точек больше PLOT_DOWNSAMPLE_THRESHOLD, график строится примерно по PLOT_MAX_POINTS
+    PLOT_DOWNSAMPLE_THRESHOLD = 1000
+    PLOT_MAX_POINTS = 500
+    
+    # Общая для всех экземпляров фигура графика (создается при первом вызове)
+    _figure = None
+    _axes = None
+    _figure_lock = threading.Lock()
+    
     def __init__(self, audio_monitor=None):
         """
         Инициализация
@@ -51,16 +66,14 @@ class SoundCheck:
         self.vlc_launcher = VLCPlaylistLauncher()
         self.audio_monitor = audio_monitor  # Используем переданный экземпляр или None
         
+        # Событие остановки: прерывает ожидание перед закрытием VLC
+        self._stop_event = threading.Event()
+        
         # Загружаем настройки из конфига
         self._load_config()
         
         # Данные для графика
-        self.soundcheck_data = {
-            'timestamps': [],
-            'audio_levels': [],
-            'start_time': None,
-            'end_time': None
-        }
+        self._reset_soundcheck_data()
     
     def _load_config(self):
         """Загружает настройки из конфигурационного файла"""
@@ -86,20 +99,83 @@ class SoundCheck:
         print(f"[SoundCheck] {message}")
     
     def _on_audio_level_updated(self, level):
-        """Колбэк для сбора данных уровня звука"""
-        current_time = datetime.now()
-        # Добавляем данные синхронно
-        self.soundcheck_data['timestamps'].append(current_time)
-        self.soundcheck_data['audio_levels'].append(float(level))
+        """Колбэк для сбора данных уровня звука (поток аудио только кладет отсчет в очередь)"""
+        self._sample_queue.append((time.time(), level))
+    
+    def _drain_samples(self):
+        """Переносит накопленные в очереди отсчеты в numpy буферы одной пачкой"""
+        queue_len = len(self._sample_queue)
+        if not queue_len:
+            return
+        # deque.popleft потокобезопасен, новые отсчеты останутся до следующего вызова
+        batch = [self._sample_queue.popleft() for _ in range(queue_len)]
+        
+        n = self._samples_count
+        required = n + queue_len
+        if required > self._levels.size:
+            # Буферы заполнены — увеличиваем емкость удвоением
+            capacity = self._levels.size
+            while capacity < required:
+                capacity *= 2
+            self._levels = np.resize(self._levels, capacity)
+            self._timestamps = np.resize(self._timestamps, capacity)
+        
+        timestamps, levels = zip(*batch)
+        self._timestamps[n:required] = timestamps
+        self._levels[n:required] = levels
+        self._samples_count = required
     
     def _reset_soundcheck_data(self):
         """Сброс данных саундчека"""
         self.soundcheck_data = {
-            'timestamps': [],
-            'audio_levels': [],
             'start_time': None,
             'end_time': None
         }
+        # Данные хранятся в предвыделенных массивах (SoA): уровни float32 и
+        # время (epoch, float64), _samples_count — число записанных точек
+        self._levels = np.empty(self.SAMPLES_INITIAL_CAPACITY, dtype=np.float32)
+        self._timestamps = np.empty(self.SAMPLES_INITIAL_CAPACITY, dtype=np.float64)
+        self._samples_count = 0
+        # Очередь отсчетов от потока аудио: (время, уровень)
+        self._sample_queue = deque()
+    
+    @classmethod
+    def _get_figure(cls):
+        """Возвращает переиспользуемые Figure и Axes для графика саундчека"""
+        if cls._figure is None:
+            cls._figure = Figure(figsize=(12, 6))
+            cls._axes = cls._figure.add_subplot()
+        return cls._figure, cls._axes
+    
+    @classmethod
+    def _downsample_for_plot(cls, times, levels):
+        """
+        Прореживает ряд для графика: максимум уровня в каждом окне (пики сохраняются)
+        
+        Args:
+            times (np.ndarray): Время точек (формат matplotlib)
+            levels (np.ndarray): Уровни звука
+        
+        Returns:
+            tuple: (times, levels) — прореженные или исходные массивы
+        """
+        if len(levels) <= cls.PLOT_DOWNSAMPLE_THRESHOLD:
+            return times, levels
+        window = len(levels) // cls.PLOT_MAX_POINTS
+        pad = (-len(levels)) % window
+        padded = np.pad(levels, (0, pad), mode='edge')
+        return times[::window], padded.reshape(-1, window).max(axis=1)
+    
+    def _get_samples(self):
+        """
+        Возвращает собранные данные без копирования
+        
+        Returns:
+            tuple: (timestamps, audio_levels) — срезы numpy массивов одинаковой длины
+        """
+        self._drain_samples()
+        n = self._samples_count
+        return self._timestamps[:n], self._levels[:n]
     
     def save_soundcheck_data(self, output_path=None):
         """
@@ -111,7 +187,8 @@ class SoundCheck:
         Returns:
             str: Путь к созданному файлу данных
         """
-        if not self.soundcheck_data['timestamps']:
+        timestamps, audio_levels = self._get_samples()
+        if not len(timestamps):
             self.log("❌ Нет данных для сохранения")
             return None
         
@@ -120,36 +197,23 @@ class SoundCheck:
             output_path = self.project_root / "soundcheck_data.json"
         
         try:
-            # Получаем массивы данных
-            timestamps = self.soundcheck_data['timestamps']
-            audio_levels = self.soundcheck_data['audio_levels']
-            
-            # Выравниваем длину массивов если необходимо
-            if len(timestamps) != len(audio_levels):
-                min_len = min(len(timestamps), len(audio_levels))
-                timestamps = timestamps[:min_len]
-                audio_levels = audio_levels[:min_len]
-                self.log(f"⚠ Обрезаны массивы до одинаковой длины: {min_len}")
-            
-            # Конвертируем в обычные Python типы для JSON
-            audio_levels_converted = [float(level) for level in audio_levels]
-            
             # Подготавливаем данные для сохранения
+            # (datetime и numpy массивы orjson сериализует сам)
             data_to_save = {
-                'start_time': self.soundcheck_data['start_time'].isoformat() if self.soundcheck_data['start_time'] else None,
-                'end_time': self.soundcheck_data['end_time'].isoformat() if self.soundcheck_data['end_time'] else None,
+                'start_time': self.soundcheck_data['start_time'],
+                'end_time': self.soundcheck_data['end_time'],
                 'duration_seconds': (self.soundcheck_data['end_time'] - self.soundcheck_data['start_time']).total_seconds() if self.soundcheck_data['start_time'] and self.soundcheck_data['end_time'] else None,
                 'data_points': len(timestamps),
-                'timestamps': [ts.isoformat() for ts in timestamps],
-                'audio_levels': audio_levels_converted,
-                'max_level': float(max(audio_levels_converted)) if audio_levels_converted else 0.0,
-                'avg_level': float(np.mean(audio_levels_converted)) if audio_levels_converted else 0.0,
-                'min_level': float(min(audio_levels_converted)) if audio_levels_converted else 0.0
+                'timestamps': [datetime.fromtimestamp(ts) for ts in timestamps.tolist()],
+                'audio_levels': audio_levels,
+                'max_level': float(audio_levels.max()),
+                'avg_level': float(audio_levels.mean(dtype=np.float64)),
+                'min_level': float(audio_levels.min())
             }
             
-            # Сохраняем в JSON файл (перезаписываем)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, indent=2, ensure_ascii=False)
+            # Сохраняем в JSON файл (перезаписываем) одной записью байтов
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(data_to_save, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
             
             self.log(f"✓ Данные саундчека сохранены: {output_path}")
             return str(output_path)
@@ -168,7 +232,8 @@ class SoundCheck:
         Returns:
             str: Путь к созданному файлу графика
         """
-        if not self.soundcheck_data['timestamps']:
+        timestamps, audio_levels = self._get_samples()
+        if not len(timestamps):
             self.log("❌ Нет данных для создания графика")
             return None
         
@@ -177,64 +242,55 @@ class SoundCheck:
             output_path = self.project_root / "soundcheck_graph.png"
         
         try:
-            # Проверяем одинаковую длину массивов
-            timestamps = self.soundcheck_data['timestamps'].copy()
-            audio_levels = self.soundcheck_data['audio_levels'].copy()
-            
-            if len(timestamps) != len(audio_levels):
-                min_len = min(len(timestamps), len(audio_levels))
-                timestamps = timestamps[:min_len]
-                audio_levels = audio_levels[:min_len]
-                self.log(f"⚠ Обрезаны массивы до одинаковой длины: {min_len}")
-            
-            # Дополнительная проверка на пустые массивы
-            if not timestamps or not audio_levels:
-                self.log("❌ Пустые массивы данных")
-                return None
-            
-            # Создаем график
-            plt.figure(figsize=(12, 6))
-            
-            # Конвертируем timestamps в числовой формат для matplotlib
-            times = mdates.date2num(timestamps)
-            
-            # Строим график
-            plt.plot(times, audio_levels, 
-                    linewidth=2, color='blue', alpha=0.7)
-            
-            # Добавляем заливку под графиком
-            plt.fill_between(times, audio_levels, 
-                           alpha=0.3, color='blue')
-            
-            # Настройка осей
-            plt.xlabel('Время', fontsize=12)
-            plt.ylabel('Уровень звука (RMS)', fontsize=12)
-            plt.title('Изменение громкости во время саундчека', fontsize=14, fontweight='bold')
-            
-            # Форматирование оси времени
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-            plt.gca().xaxis.set_major_locator(mdates.SecondLocator(interval=2))
-            plt.xticks(rotation=45)
-            
-            # Добавляем сетку
-            plt.grid(True, alpha=0.3)
+            # Конвертируем timestamps в числовой формат для matplotlib одной векторной операцией:
+            # epoch-секунды сдвигаются на смещение локального часового пояса и переводятся в datetime64
+            utc_offset = datetime.fromtimestamp(timestamps[0]).astimezone().utcoffset().total_seconds()
+            local_us = np.rint((timestamps + utc_offset) * 1e6).astype(np.int64).astype('datetime64[us]')
+            times = mdates.date2num(local_us)
+            # Для длинных саундчеков рисуем прореженный ряд (в JSON сохраняются все точки)
+            plot_times, plot_levels = self._downsample_for_plot(times, audio_levels)
             
-            # Добавляем статистику
-            if audio_levels:
-                max_level = max(audio_levels)
-                avg_level = np.mean(audio_levels)
-                duration = (timestamps[-1] - timestamps[0]).total_seconds()
+            with SoundCheck._figure_lock:
+                # Переиспользуем одну фигуру между запусками, очищая оси
+                fig, ax = self._get_figure()
+                ax.clear()
                 
-                stats_text = f"Макс: {max_level:.4f}\nСреднее: {avg_level:.4f}\nДлительность: {duration:.1f}с"
-                plt.text(0.02, 0.98, stats_text, transform=plt.gca().transAxes, 
-                        verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-            
-            # Настройка layout
-            plt.tight_layout()
-            
-            # Сохраняем график
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
-            plt.close()
+                # Строим график
+                ax.plot(plot_times, plot_levels, 
+                        linewidth=2, color='blue', alpha=0.7)
+                
+                # Добавляем заливку под графиком
+                ax.fill_between(plot_times, plot_levels, 
+                                alpha=0.3, color='blue')
+                
+                # Настройка осей
+                ax.set_xlabel('Время', fontsize=12)
+                ax.set_ylabel('Уровень звука (RMS)', fontsize=12)
+                ax.set_title('Изменение громкости во время саундчека', fontsize=14, fontweight='bold')
+                
+                # Форматирование оси времени
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+                ax.xaxis.set_major_locator(mdates.SecondLocator(interval=2))
+                ax.tick_params(axis='x', labelrotation=45)
+                
+                # Добавляем сетку
+                ax.grid(True, alpha=0.3)
+                
+                # Добавляем статистику
+                if len(audio_levels):
+                    max_level = audio_levels.max()
+                    avg_level = audio_levels.mean(dtype=np.float64)
+                    duration = timestamps[-1] - timestamps[0]
+                    
+                    stats_text = f"Макс: {max_level:.4f}\nСреднее: {avg_level:.4f}\nДлительность: {duration:.1f}с"
+                    ax.text(0.02, 0.98, stats_text, transform=ax.transAxes, 
+                            verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+                
+                # Настройка layout (подписи уже помещаются, второй проход bbox_inches='tight' не нужен)
+                fig.tight_layout()
+                
+                # Сохраняем график (150 dpi достаточно для картинки в ВК и веб-интерфейсе)
+                fig.savefig(output_path, dpi=150)
             
             self.log(f"✓ График сохранен: {output_path}")
             return str(output_path)
@@ -338,10 +394,15 @@ class SoundCheck:
         
         # Шаг 5: Ждем и закрываем VLC
         self.log(f"Шаг 5/5: Жду {self.delay_before_close} секунд перед закрытием VLC...")
-        for i in range(self.delay_before_close, 0, -1):
-            print(f"  {i}...", end='\r')
-            time.sleep(1)
-        print()  # Новая строка после обратного отсчета
+        if sys.stdout.isatty():
+            # Обратный отсчет нужен только при запуске из консоли
+            for i in range(self.delay_before_close, 0, -1):
+                print(f"  {i}...", end='\r')
+                if self._stop_event.wait(1):
+                    break
+            print()  # Новая строка после обратного отсчета
+        else:
+            self._stop_event.wait(self.delay_before_close)
         
         self.log("Закрываю VLC...")
         try:
@@ -375,8 +436,14 @@ class SoundCheck:
         
         return True
     
+    def stop(self):
+        """Прерывает ожидание саундчека (ресурсы не освобождает)"""
+        self._stop_event.set()
+    
     def cleanup(self):
         """Очистка ресурсов"""
+        # Прерываем ожидание саундчека, если оно идет
+        self.stop()
         if self.audio_monitor:
             try:
                 # НЕ вызываем cleanup() чтобы не завершать PyAudio
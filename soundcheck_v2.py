@@ -9,13 +9,14 @@
 import os
 import sys
 import time
-import json
+import threading
 from pathlib import Path
+import orjson
 import matplotlib
 # Используем безоконный backend, чтобы работать из серверных потоков
 matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
 from datetime import datetime
 import numpy as np
 
@@ -35,6 +36,21 @@ def get_exe_dir():
 class SoundCheckV2:
     """Класс для запуска саундчека с сравнением массивов"""
     
+    # Начальная емкость буфера уровней (удваивается при заполнении)
+    SAMPLES_INITIAL_CAPACITY = 4096
+    
+    # Перед сравнением массивы усредняются окнами до не более SIMILARITY_MAX_POINTS точек
+    SIMILARITY_MAX_POINTS = 256
+    
+    # Общая для всех экземпляров фигура графика (создается при первом вызове)
+    _figure = None
+    _axes = None
+    _figure_lock = threading.Lock()
+    
+    # Кэш разобранных JSON файлов (конфиг, эталонные данные): путь -> ((mtime_ns, size), данные)
+    _json_cache = {}
+    _json_cache_lock = threading.Lock()
+    
     def __init__(self, audio_monitor=None):
         """
         Инициализация
@@ -59,26 +75,46 @@ class SoundCheckV2:
         self._monitoring_was_active = False
         self._monitoring_enabled_was = None
         
+        # Событие остановки: прерывает ожидание перед закрытием VLC
+        self._stop_event = threading.Event()
+        
         # Загружаем настройки из конфига
         self._load_config()
         
         # Данные для графика
-        self.soundcheck_data = {
-            'timestamps': [],
-            'audio_levels': [],
-            'start_time': None,
-            'end_time': None
-        }
+        self._reset_soundcheck_data()
         
         # Предыдущие данные для сравнения
         self.previous_data = None
     
+    @classmethod
+    def _read_json_cached(cls, path):
+        """
+        Читает JSON файл через orjson, повторно разбирая его только после изменения файла
+        
+        Args:
+            path (Path): Путь к файлу
+        
+        Returns:
+            dict: Разобранные данные (общие для всех экземпляров, не изменять)
+        """
+        stat = path.stat()
+        key = str(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with cls._json_cache_lock:
+            cached = cls._json_cache.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        data = orjson.loads(path.read_bytes())
+        with cls._json_cache_lock:
+            cls._json_cache[key] = (version, data)
+        return data
+    
     def _load_config(self):
         """Загружает настройки из конфигурационного файла"""
         try:
             if self.config_file.exists():
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = self._read_json_cached(self.config_file)
                 
                 # Загружаем длительность саундчека из конфига
                 self.delay_before_close = config.get('soundcheck_duration_seconds', 10)
@@ -98,19 +134,82 @@ class SoundCheckV2:
     
     def _on_audio_level_updated(self, level):
         """Колбэк для сбора данных уровня звука"""
-        current_time = datetime.now()
-        # Добавляем данные синхронно
-        self.soundcheck_data['timestamps'].append(current_time)
-        self.soundcheck_data['audio_levels'].append(float(level))
+        # После фиксации end_time сбор завершен: массивы больше не меняются
+        if self.soundcheck_data['end_time'] is not None:
+            return
+        # Время точки — монотонные секунды perf_counter, в даты переводятся только при построении графика
+        current_time = time.perf_counter()
+        n = self._samples_count
+        if n == self._levels.size:
+            # Буферы заполнены — увеличиваем емкость удвоением
+            self._levels = np.resize(self._levels, n * 2)
+            self._timestamps = np.resize(self._timestamps, n * 2)
+        self._timestamps[n] = current_time
+        self._levels[n] = level
+        self._samples_count = n + 1
     
     def _reset_soundcheck_data(self):
         """Сброс данных саундчека"""
         self.soundcheck_data = {
-            'timestamps': [],
-            'audio_levels': [],
             'start_time': None,
             'end_time': None
         }
+        # Данные хранятся в предвыделенных массивах: уровни float32 и время
+        # (perf_counter, float64), _samples_count — число записанных точек
+        capacity = self._initial_capacity()
+        self._levels = np.empty(capacity, dtype=np.float32)
+        self._timestamps = np.empty(capacity, dtype=np.float64)
+        self._samples_count = 0
+        # Значение perf_counter в момент start_time (точка отсчета для перевода в даты)
+        self._perf_start = None
+    
+    def _initial_capacity(self):
+        """
+        Емкость буферов с запасом на весь саундчек, чтобы не расширять их во время записи
+        
+        Returns:
+            int: Количество точек
+        """
+        capacity = self.SAMPLES_INITIAL_CAPACITY
+        if self.audio_monitor and self.audio_monitor.chunk_size:
+            # Колбэк уровня вызывается на каждый прочитанный блок аудио
+            callbacks_per_second = self.audio_monitor.sample_rate / self.audio_monitor.chunk_size
+            # Запас x2 и +5 секунд на паузы до запуска VLC и после его закрытия
+            expected = int((self.delay_before_close + 5) * callbacks_per_second * 2)
+            capacity = max(capacity, expected)
+        return capacity
+    
+    @classmethod
+    def _get_figure(cls):
+        """Возвращает переиспользуемые Figure и Axes для графика саундчека"""
+        if cls._figure is None:
+            cls._figure = Figure(figsize=(12, 6))
+            cls._axes = cls._figure.add_subplot()
+        return cls._figure, cls._axes
+    
+    def _get_samples(self):
+        """
+        Возвращает собранные данные без копирования
+        
+        Returns:
+            tuple: (timestamps, audio_levels) — срезы numpy массивов одинаковой длины
+        """
+        n = self._samples_count
+        return self._timestamps[:n], self._levels[:n]
+    
+    def _timestamps_to_datetime64(self, timestamps):
+        """
+        Переводит отсчеты perf_counter в даты одной векторной операцией
+        
+        Args:
+            timestamps (np.ndarray): Время точек (perf_counter, секунды)
+        
+        Returns:
+            np.ndarray: Массив datetime64[us]
+        """
+        start_dt64 = np.datetime64(self.soundcheck_data['start_time'], 'us')
+        offsets_us = np.rint((timestamps - self._perf_start) * 1e6).astype('timedelta64[us]')
+        return start_dt64 + offsets_us
     
     def load_previous_data(self):
         """
@@ -124,8 +223,7 @@ class SoundCheckV2:
             return None
         
         try:
-            with open(self.previous_data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = self._read_json_cached(self.previous_data_file)
             
             # Проверяем наличие необходимых полей
             if 'audio_levels' not in data:
@@ -139,31 +237,59 @@ class SoundCheckV2:
             self.log(f"❌ Ошибка при загрузке предыдущих данных: {e}")
             return None
     
+    @classmethod
+    def _downsample_for_similarity(cls, levels):
+        """
+        Усредняет ряд окнами, чтобы в нем было не больше SIMILARITY_MAX_POINTS точек
+        
+        Args:
+            levels (np.ndarray): Уровни звука
+        
+        Returns:
+            np.ndarray: Усредненный или исходный массив
+        """
+        if len(levels) <= cls.SIMILARITY_MAX_POINTS:
+            return levels
+        window = -(-len(levels) // cls.SIMILARITY_MAX_POINTS)
+        usable = len(levels) // window * window
+        return levels[:usable].reshape(-1, window).mean(axis=1)
+    
     def calculate_similarity_percentage(self, current_levels, previous_levels):
         """
         Вычисляет процент схожести между двумя массивами уровней звука
         
         Args:
-            current_levels (list): Текущий массив уровней
-            previous_levels (list): Предыдущий массив уровней
+            current_levels (np.ndarray | list): Текущий массив уровней
+            previous_levels (np.ndarray | list): Предыдущий массив уровней
         
         Returns:
             float: Процент схожести (0-100)
         """
-        if not current_levels or not previous_levels:
+        if len(current_levels) == 0 or len(previous_levels) == 0:
             return 0.0
         
-        # Приводим массивы к одинаковой длине (берем минимальную)
+        # Приводим массивы к одинаковой длине (берем минимальную), float32 без лишних копий
         min_len = min(len(current_levels), len(previous_levels))
-        current_array = np.array(current_levels[:min_len])
-        previous_array = np.array(previous_levels[:min_len])
-        
-        # Нормализуем массивы (приводим к диапазону 0-1)
-        current_norm = (current_array - current_array.min()) / (current_array.max() - current_array.min() + 1e-10)
-        previous_norm = (previous_array - previous_array.min()) / (previous_array.max() - previous_array.min() + 1e-10)
-        
-        # Вычисляем коэффициент корреляции Пирсона
-        correlation = np.corrcoef(current_norm, previous_norm)[0, 1]
+        current_array = np.asarray(current_levels, dtype=np.float32)[:min_len]
+        previous_array = np.asarray(previous_levels, dtype=np.float32)[:min_len]
+        
+        # Время сравнения ограничено: длинные ряды усредняются окнами одинаковой ширины
+        current_array = self._downsample_for_similarity(current_array)
+        previous_array = self._downsample_for_similarity(previous_array)
+        
+        # Коэффициент корреляции Пирсона = косинусная мера центрированных массивов
+        # (без построения ковариационной матрицы, как в np.corrcoef).
+        # Корреляция не зависит от сдвига и масштаба, поэтому нормализация не нужна
+        current_centered = current_array - current_array.mean()
+        previous_centered = previous_array - previous_array.mean()
+        # Скалярное произведение и нормы считаем во float64: во float32 ошибка округления
+        # дает корреляцию чуть больше 1 (и схожесть больше 100%) для одинаковых рядов
+        current_centered = current_centered.astype(np.float64)
+        previous_centered = previous_centered.astype(np.float64)
+        numerator = current_centered.dot(previous_centered)
+        denominator = np.linalg.norm(current_centered) * np.linalg.norm(previous_centered) + 1e-12
+        # Как и np.corrcoef, ограничиваем результат диапазоном [-1, 1]
+        correlation = float(np.clip(numerator / denominator, -1.0, 1.0))
         
         # Преобразуем корреляцию в процент схожести
         # Корреляция от -1 до 1, нам нужен процент от 0 до 100
@@ -178,7 +304,8 @@ class SoundCheckV2:
         Returns:
             float: Процент схожести или None если сравнение невозможно
         """
-        if not self.soundcheck_data['audio_levels']:
+        _, current_levels = self._get_samples()
+        if not len(current_levels):
             self.log("❌ Нет текущих данных для сравнения")
             return None
         
@@ -186,7 +313,6 @@ class SoundCheckV2:
             self.log("❌ Нет предыдущих данных для сравнения")
             return None
         
-        current_levels = self.soundcheck_data['audio_levels']
         previous_levels = self.previous_data['audio_levels']
         
         similarity = self.calculate_similarity_percentage(current_levels, previous_levels)
@@ -222,7 +348,8 @@ class SoundCheckV2:
         Returns:
             str: Путь к созданному файлу графика
         """
-        if not self.soundcheck_data['timestamps']:
+        timestamps, audio_levels = self._get_samples()
+        if not len(timestamps) or self.soundcheck_data['start_time'] is None:
             self.log("❌ Нет данных для создания графика")
             return None
         
@@ -231,64 +358,51 @@ class SoundCheckV2:
             output_path = self.project_root / "soundcheck_graph_v2.png"
         
         try:
-            # Проверяем одинаковую длину массивов
-            timestamps = self.soundcheck_data['timestamps'].copy()
-            audio_levels = self.soundcheck_data['audio_levels'].copy()
-            
-            if len(timestamps) != len(audio_levels):
-                min_len = min(len(timestamps), len(audio_levels))
-                timestamps = timestamps[:min_len]
-                audio_levels = audio_levels[:min_len]
-                self.log(f"⚠ Обрезаны массивы до одинаковой длины: {min_len}")
-            
-            # Дополнительная проверка на пустые массивы
-            if not timestamps or not audio_levels:
-                self.log("❌ Пустые массивы данных")
-                return None
-            
-            # Создаем график
-            plt.figure(figsize=(12, 6))
-            
             # Конвертируем timestamps в числовой формат для matplotlib
-            times = mdates.date2num(timestamps)
-            
-            # Строим график
-            plt.plot(times, audio_levels, 
-                    linewidth=2, color='blue', alpha=0.7)
+            # (сбор завершен — end_time выставлен, поэтому срезы используются без копирования)
+            times = mdates.date2num(self._timestamps_to_datetime64(timestamps))
             
-            # Добавляем заливку под графиком
-            plt.fill_between(times, audio_levels, 
-                           alpha=0.3, color='blue')
-            
-            # Настройка осей
-            plt.xlabel('Время', fontsize=12)
-            plt.ylabel('Уровень звука (RMS)', fontsize=12)
-            plt.title('Изменение громкости во время саундчека (V2)', fontsize=14, fontweight='bold')
-            
-            # Форматирование оси времени
-            plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-            plt.gca().xaxis.set_major_locator(mdates.SecondLocator(interval=2))
-            plt.xticks(rotation=45)
-            
-            # Добавляем сетку
-            plt.grid(True, alpha=0.3)
-            
-            # Добавляем статистику
-            if audio_levels:
-                max_level = max(audio_levels)
-                avg_level = np.mean(audio_levels)
-                duration = (timestamps[-1] - timestamps[0]).total_seconds()
+            with SoundCheckV2._figure_lock:
+                # Переиспользуем одну фигуру между запусками, очищая оси
+                fig, ax = self._get_figure()
+                ax.clear()
                 
-                stats_text = f"Макс: {max_level:.4f}\nСреднее: {avg_level:.4f}\nДлительность: {duration:.1f}с"
-                plt.text(0.02, 0.98, stats_text, transform=plt.gca().transAxes, 
-                        verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
-            
-            # Настройка layout
-            plt.tight_layout()
-            
-            # Сохраняем график
-            plt.savefig(output_path, dpi=300, bbox_inches='tight')
-            plt.close()
+                # Строим график
+                ax.plot(times, audio_levels, 
+                        linewidth=2, color='blue', alpha=0.7)
+                
+                # Добавляем заливку под графиком
+                ax.fill_between(times, audio_levels, 
+                                alpha=0.3, color='blue')
+                
+                # Настройка осей
+                ax.set_xlabel('Время', fontsize=12)
+                ax.set_ylabel('Уровень звука (RMS)', fontsize=12)
+                ax.set_title('Изменение громкости во время саундчека (V2)', fontsize=14, fontweight='bold')
+                
+                # Форматирование оси времени
+                ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+                ax.xaxis.set_major_locator(mdates.SecondLocator(interval=2))
+                ax.tick_params(axis='x', labelrotation=45)
+                
+                # Добавляем сетку
+                ax.grid(True, alpha=0.3)
+                
+                # Добавляем статистику
+                if len(audio_levels):
+                    max_level = audio_levels.max()
+                    avg_level = audio_levels.mean(dtype=np.float64)
+                    duration = timestamps[-1] - timestamps[0]
+                    
+                    stats_text = f"Макс: {max_level:.4f}\nСреднее: {avg_level:.4f}\nДлительность: {duration:.1f}с"
+                    ax.text(0.02, 0.98, stats_text, transform=ax.transAxes, 
+                            verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
+                
+                # Настройка layout (подписи уже помещаются, второй проход bbox_inches='tight' не нужен)
+                fig.tight_layout()
+                
+                # Сохраняем график (150 dpi достаточно для картинки в ВК и веб-интерфейсе)
+                fig.savefig(output_path, dpi=150)
             
             self.log(f"✓ График сохранен: {output_path}")
             return str(output_path)
@@ -314,11 +428,16 @@ class SoundCheckV2:
         
         # Шаг 0: Загружаем предыдущие данные
         self.log("Шаг 0/6: Загружаю предыдущие данные...")
+        # Перечитываем конфиг: экземпляр может переиспользоваться между запусками
+        self._load_config()
         self.previous_data = self.load_previous_data()
         
         # Сбрасываем данные предыдущего саундчека
         self._reset_soundcheck_data()
+        # Экземпляр переиспользуется сервером, поэтому сбрасываем событие остановки
+        self._stop_event.clear()
         self.soundcheck_data['start_time'] = datetime.now()
+        self._perf_start = time.perf_counter()
         
         # Проверяем наличие VLC перед началом
         if not self.vlc_launcher.vlc_paths:
@@ -429,10 +548,15 @@ class SoundCheckV2:
         
         # Шаг 5: Ждем и закрываем VLC
         self.log(f"Шаг 5/6: Жду {self.delay_before_close} секунд перед закрытием VLC...")
-        for i in range(self.delay_before_close, 0, -1):
-            print(f"  {i}...", end='\r')
-            time.sleep(1)
-        print()  # Новая строка после обратного отсчета
+        if sys.stdout.isatty():
+            # Обратный отсчет нужен только при запуске из консоли
+            for i in range(self.delay_before_close, 0, -1):
+                print(f"  {i}...", end='\r')
+                if self._stop_event.wait(1):
+                    break
+            print()  # Новая строка после обратного отсчета
+        else:
+            self._stop_event.wait(self.delay_before_close)
         
         self.log("Закрываю VLC...")
         try:
@@ -482,8 +606,14 @@ class SoundCheckV2:
         
         return True
     
+    def stop(self):
+        """Прерывает ожидание саундчека (общий PyAudio не трогает)"""
+        self._stop_event.set()
+    
     def cleanup(self):
         """Очистка ресурсов"""
+        # Прерываем ожидание саундчека, если оно идет
+        self.stop()
         if self.audio_monitor:
             try:
                 # НЕ вызываем cleanup() чтобы не завершать PyAudio
@@ -7,11 +7,23 @@
 Бот переведен на ВКонтакте. Этот файл перенаправляет импорты.
 """
 
-from vk_bot import DiscoVKBot, get_exe_dir
-
-# Для обратной совместимости
-TelegramNotifier = DiscoVKBot
-DiscoTelegramBot = DiscoVKBot
+# Для обратной совместимости: старые имена -> имена в vk_bot.
+# vk_bot импортируется только при первом обращении к одному из них (PEP 562)
+_ALIASES = {
+    'DiscoVKBot': 'DiscoVKBot',
+    'TelegramNotifier': 'DiscoVKBot',
+    'DiscoTelegramBot': 'DiscoVKBot',
+    'get_exe_dir': 'get_exe_dir',
+}
+__all__ = list(_ALIASES)
+
+
+def __getattr__(name):
+    """Ленивое перенаправление старых имен в vk_bot"""
+    if name in _ALIASES:
+        import vk_bot
+        return getattr(vk_bot, _ALIASES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def main():
@@ -9,17 +9,26 @@
 
 import os
 import sys
-import json
+import queue
+import orjson
 import subprocess
 import time
-import traceback
 import requests
 import random
-from datetime import datetime, timedelta
-from mutagen.mp3 import MP3
+import threading
+import logging
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+from playlist_gen import get_track_duration
 from requests.exceptions import RequestException, Timeout, ConnectionError
 
 
+# Дочерний логгер 'disco': в сервере записи уходят в его QueueHandler и пишутся фоновым потоком
+logger = logging.getLogger('disco.vk_bot')
+
+
 def get_exe_dir():
     """Получает директорию где находится exe файл"""
     if getattr(sys, 'frozen', False):
@@ -28,6 +37,93 @@ def get_exe_dir():
         return os.path.dirname(os.path.abspath(__file__))
 
 
+class TokenBucket:
+    """
+    Потокобезопасный ограничитель частоты запросов (token bucket).
+    Допускает всплеск до capacity запросов, далее — refill_rate запросов в секунду.
+    """
+
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Забирает один токен, при необходимости ожидая его пополнения"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.refill_rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.refill_rate
+            time.sleep(wait)
+
+
+class VKUnavailableError(Exception):
+    """VK API временно недоступен (circuit breaker открыт), запрос не выполнялся"""
+
+
+class CircuitBreaker:
+    """
+    Автомат CLOSED/OPEN/HALF_OPEN для быстрого отказа во время недоступности сервиса.
+    После fail_threshold сбоев подряд запросы отклоняются reset_timeout секунд,
+    затем пропускается один пробный запрос: успех закрывает автомат, сбой снова открывает.
+    """
+
+    CLOSED = 'CLOSED'
+    OPEN = 'OPEN'
+    HALF_OPEN = 'HALF_OPEN'
+
+    def __init__(self, fail_threshold, reset_timeout):
+        self.fail_threshold = fail_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state):
+        logger.warning("[VK Bot] Circuit breaker: %s → %s", self._state, state)
+        self._state = state
+
+    def allow(self):
+        """Можно ли выполнить запрос сейчас"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Пропускаем один пробный запрос
+                self._set_state(self.HALF_OPEN)
+                return True
+            # OPEN до истечения таймаута или HALF_OPEN с уже идущим пробным запросом
+            return False
+
+    def on_success(self):
+        """Запрос выполнен успешно"""
+        with self._lock:
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def on_failure(self):
+        """Запрос завершился сетевой ошибкой или ошибкой сервера"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and self._failures >= self.fail_threshold):
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+
 class DiscoVKBot:
     """
     Класс для ВК-бота дискотеки.
@@ -36,8 +132,70 @@ class DiscoVKBot:
 
     VK_API_VERSION = '5.199'
     VK_API_BASE = 'https://api.vk.com/method'
-
-    def __init__(self, config_file=None, config_lock=None):
+    VK_MESSAGES_SEND_URL = VK_API_BASE + '/messages.send'
+    # URL методов VK API, уже использованных ботом (набор методов фиксирован и невелик)
+    _method_urls = {'messages.send': VK_MESSAGES_SEND_URL}
+    # Заголовок для заранее закодированного тела запроса (bytes)
+    FORM_HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+    # Лимит VK API для ключа сообщества — 20 запросов в секунду
+    VK_API_RATE_LIMIT = 20
+
+    # Тексты уведомлений: неизменные шаблоны, подставляется только время/длительность
+    DATETIME_FORMAT = '%d.%m.%Y %H:%M'
+    MSG_DISCO_STARTED = "Дискотека началась!\n\nВремя: {time}\n\nМузыка запущена"
+    MSG_DISCO_STOPPED = "Дискотека завершена\n\nВремя: {time}\nДо встречи!"
+    MSG_MUSIC_STOPPED = "Музыка перестала играть!\n\nТишина: {silence:.0f} секунд"
+    MSG_MUSIC_RESTORED = "Звук есть\n\nВсе хорошо"
+    MSG_SERVER_STARTED = (
+        "Сервер перезагружен\n\n"
+        "Время: {time}\n"
+        "Система планировщика активна\n"
+        "Готов к работе!"
+    )
+
+    # Максимум уведомлений, ожидающих отправки в фоновом потоке
+    NOTIFY_QUEUE_SIZE = 256
+    # Сколько уведомлений фоновый поток забирает из очереди за раз для схлопывания повторов
+    NOTIFY_BATCH_SIZE = 32
+
+    # Повтор того же уведомления с тем же текстом в течение этого окна (сек) не отправляется
+    NOTIFY_DEBOUNCE_INTERVAL = 15.0
+    # Максимальная длина текста одного сообщения VK
+    VK_MESSAGE_MAX_LENGTH = 4096
+    # Запись конфига откладывается на столько секунд: серия изменений подписок сохраняется одной записью
+    CONFIG_SAVE_DELAY = 0.5
+
+    # Circuit breaker: после 5 сбоев подряд запросы к VK API не выполняются 30 секунд
+    CIRCUIT_FAIL_THRESHOLD = 5
+    CIRCUIT_RESET_TIMEOUT = 30.0
+
+    # Максимум параллельных отправок при рассылке нескольким получателям
+    BROADCAST_MAX_WORKERS = 8
+
+    # Коды ошибок VK API, при которых запрос имеет смысл повторить:
+    # 1 — неизвестная ошибка, 6 — слишком много запросов в секунду, 10 — внутренняя ошибка сервера
+    VK_RETRIABLE_ERRORS = (1, 6, 10)
+    # Экспоненциальная задержка между повторами с полным джиттером (секунды)
+    RETRY_BACKOFF_BASE = 0.5
+    RETRY_BACKOFF_CAP = 8.0
+    # Верхняя граница ожидания по заголовку Retry-After ответа HTTP 429 (секунды)
+    RETRY_AFTER_CAP = 30.0
+    # Постоянные ошибки доставки конкретному получателю: 7/15 — нет прав/доступа,
+    # 901/902 — пользователь запретил сообщения от сообщества, 917 — нет доступа к беседе
+    VK_PEER_PERMANENT_ERRORS = (7, 15, 901, 902, 917)
+    # После стольких постоянных ошибок подряд получатель пропускается в рассылках
+    PEER_QUARANTINE_THRESHOLD = 2
+
+    def __init__(self, config_file=None, config_lock=None, session=None):
+        """
+        Args:
+            config_file (str): Путь к scheduler_config.json (по умолчанию рядом с программой)
+            config_lock (Lock): Общий lock для записи в конфиг
+            session: Готовая HTTP-сессия с интерфейсом requests.Session (post/get/close).
+                Позволяет подставить заглушку и проверять повторы, лимит частоты и
+                circuit breaker без обращения к api.vk.com. Такую сессию бот не закрывает.
+        """
         if config_file is None:
             config_file = os.path.join(get_exe_dir(), 'scheduler_config.json')
 
@@ -46,28 +204,66 @@ class DiscoVKBot:
         self.vk_token = None
         self.group_id = None
         self.peer_ids = []  # ID бесед/пользователей для уведомлений
+        self._peer_id_set = set()  # Те же ID для проверки принадлежности за O(1)
         self.admin_users = []  # VK user IDs администраторов
+        self._admin_user_set = frozenset()  # Те же ID для проверки в is_admin за O(1)
         self.notifications_enabled = True
         self.enabled = False
         self.tunnel_script = os.path.join(get_exe_dir(), 'check_tunnel.sh')
 
+        # Разобранный конфиг и версия файла (mtime_ns, size), из которой он прочитан
+        self._config_cache = None
+        self._config_version = None
+        # Отложенное сохранение конфига (см. _schedule_save_config / flush_config)
+        self._config_dirty = False
+        self._save_timer = None
+        self._save_timer_lock = threading.Lock()
+
+        # Последнее отправленное уведомление каждого типа: (monotonic, текст)
+        self._last_notifications = {}
+        self._notify_lock = threading.Lock()
+        # Уведомления отправляются фоновым потоком, чтобы не задерживать планировщик и монитор звука
+        # (поток запускается при первом уведомлении — при отключенном боте он не нужен)
+        self._notify_queue = queue.Queue(maxsize=self.NOTIFY_QUEUE_SIZE)
+        self._notify_thread = None
+        # Устанавливается в close(): отправки, идущие в этот момент, перестают ждать и повторять
+        self._closing = threading.Event()
+
         # Long Poll
         self._lp_server = None
         self._lp_key = None
         self._lp_ts = None
 
+        # Общая HTTP-сессия: keep-alive соединения переиспользуются между запросами
+        # (создается при первом запросе, см. _get_session)
+        self._session = session
+        self._owns_session = session is None
+        self._session_lock = threading.Lock()
+        # Общий для всех потоков ограничитель частоты вызовов VK API
+        self._rate_limiter = TokenBucket(self.VK_API_RATE_LIMIT, float(self.VK_API_RATE_LIMIT))
+        # Быстрый отказ во время недоступности VK API
+        self._circuit = CircuitBreaker(self.CIRCUIT_FAIL_THRESHOLD, self.CIRCUIT_RESET_TIMEOUT)
+        # Пул для параллельной рассылки (потоки создаются по мере необходимости)
+        self._send_pool = ThreadPoolExecutor(max_workers=self.BROADCAST_MAX_WORKERS,
+                                             thread_name_prefix='VKSend')
+        # Получатели с постоянными ошибками доставки: счетчики подряд идущих ошибок и карантин
+        # (только в памяти — подписка в конфиге сохраняется, карантин снимается, когда получатель напишет боту)
+        self._peer_failures = {}
+        self._quarantined_peers = set()
+        self._peer_state_lock = threading.Lock()
+
         self.load_config()
 
         if self.vk_token:
             self.enabled = True
             status = "включены" if self.notifications_enabled else "отключены"
-            print(f"[VK Bot] Бот инициализирован, уведомления {status}")
+            logger.info("[VK Bot] Бот инициализирован, уведомления %s", status)
             if self.peer_ids:
-                print(f"[VK Bot] Получателей: {len(self.peer_ids)}")
+                logger.info("[VK Bot] Получателей: %s", len(self.peer_ids))
             else:
-                print("[VK Bot] Нет получателей — беседа подпишется автоматически при первом сообщении")
+                logger.info("[VK Bot] Нет получателей — беседа подпишется автоматически при первом сообщении")
         else:
-            print("[VK Bot] Токен группы ВК не задан в конфигурации")
+            logger.warning("[VK Bot] Токен группы ВК не задан в конфигурации")
 
         # Имитируем атрибут bot для совместимости с scheduler_server.py
         self.bot = True if self.enabled else None
@@ -76,23 +272,93 @@ class DiscoVKBot:
         """Загрузка конфигурации из файла"""
         try:
             if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                config = self._read_config()
 
-                self.vk_token = config.get('vk_group_token', '')
-                self.group_id = config.get('vk_group_id', 0)
-                self.peer_ids = config.get('vk_peer_ids', [])
-                self.admin_users = config.get('vk_admin_users', [])
+                # Типы приводятся один раз здесь, а не при каждой отправке
+                self.vk_token = str(config.get('vk_group_token') or '').strip()
+                try:
+                    self.group_id = int(config.get('vk_group_id') or 0)
+                except (TypeError, ValueError):
+                    logger.warning("[VK Bot] Некорректный vk_group_id в конфигурации: %r", config.get('vk_group_id'))
+                    self.group_id = 0
+                self.peer_ids = self._normalize_ids(config.get('vk_peer_ids', []), 'peer_id')
+                self._peer_id_set = set(self.peer_ids)
+                self.admin_users = self._normalize_ids(config.get('vk_admin_users', []), 'vk_admin_users')
+                self._admin_user_set = frozenset(self.admin_users)
                 self.notifications_enabled = config.get('vk_notifications_enabled', True)
 
                 self.enabled = bool(self.vk_token)
             else:
-                print(f"[VK Bot] Файл конфигурации не найден: {self.config_file}")
+                logger.warning("[VK Bot] Файл конфигурации не найден: %s", self.config_file)
                 self.enabled = False
         except Exception as e:
-            print(f"[VK Bot] Ошибка при загрузке конфигурации: {e}")
+            logger.warning("[VK Bot] Ошибка при загрузке конфигурации: %s", e)
             self.enabled = False
 
+    @staticmethod
+    def _normalize_ids(raw_ids, name):
+        """Приводит ID ВКонтакте к int и убирает повторы, сохраняя порядок"""
+        peer_ids = {}
+        for raw_id in raw_ids or []:
+            try:
+                peer_ids[int(raw_id)] = None
+            except (TypeError, ValueError):
+                logger.warning("[VK Bot] Пропущен некорректный %s в конфигурации: %r", name, raw_id)
+        return list(peer_ids)
+
+    @classmethod
+    def _create_session(cls):
+        """Создает HTTP-сессию с пулом keep-alive соединений"""
+        session = requests.Session()
+        # urllib3 держит отдельный пул на каждый хост, поэтому загрузки фото (сервер загрузки VK)
+        # не занимают соединения api.vk.com. Размер пула не меньше числа потоков рассылки —
+        # иначе при параллельной отправке лишние соединения закрываются, а не переиспользуются.
+        # Повторы выполняются в методах отправки, поэтому у адаптера их нет
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=cls.BROADCAST_MAX_WORKERS, max_retries=0)
+        session.mount('https://', adapter)
+        return session
+
+    def _get_session(self):
+        """Возвращает общую HTTP-сессию, создавая её при первом обращении"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def close(self, timeout=10.0):
+        """
+        Дожидается отправки уведомлений из очереди (не дольше timeout), затем закрывает
+        пул рассылки и HTTP-сессию. Не успевшие уйти отправки прерываются, а не досылаются
+        """
+        deadline = time.monotonic() + timeout
+        self.flush_config()
+        flushed = self.flush(timeout)
+        self._closing.set()
+        if self._notify_thread is not None:
+            try:
+                self._notify_queue.put_nowait(None)  # Сигнал остановки фоновому потоку
+            except queue.Full:
+                pass  # Поток сам завершится, увидев _closing
+            self._notify_thread.join(max(0.0, deadline - time.monotonic()))
+        # Если очередь не опустела, не ждем зависших повторов и отменяем еще не начатые отправки
+        self._send_pool.shutdown(wait=flushed, cancel_futures=not flushed)
+        if self._session is not None and self._owns_session:
+            self._session.close()
+
+    def _read_config(self):
+        """
+        Возвращает разобранный конфиг, перечитывая файл только если он изменился
+        (конфиг общий с планировщиком и сервером, поэтому версия сверяется по mtime и размеру)
+        """
+        stat = os.stat(self.config_file)
+        version = (stat.st_mtime_ns, stat.st_size)
+        if self._config_cache is None or version != self._config_version:
+            with open(self.config_file, 'rb') as f:
+                self._config_cache = orjson.loads(f.read())
+            self._config_version = version
+        return self._config_cache
+
     # Для совместимости: chat_ids = peer_ids
     @property
     def chat_ids(self):
@@ -102,12 +368,36 @@ class DiscoVKBot:
     # VK API вызовы
     # ============================================
 
+    def _post_api(self, url, params, timeout):
+        """
+        POST-запрос к методу VK API с учетом лимита частоты и circuit breaker
+
+        Args:
+            params: dict параметров или уже закодированное тело формы (bytes)
+        """
+        if not self._circuit.allow():
+            raise VKUnavailableError("VK API временно недоступен, запрос пропущен")
+        self._rate_limiter.acquire()
+        headers = self.FORM_HEADERS if isinstance(params, bytes) else None
+        try:
+            response = self._get_session().post(url, data=params, headers=headers, timeout=timeout)
+        except RequestException:
+            self._circuit.on_failure()
+            raise
+        if response.status_code >= 500:
+            self._circuit.on_failure()
+        else:
+            self._circuit.on_success()
+        return response
+
     def _vk_api(self, method, **params):
         """Вызов метода VK API"""
         params['access_token'] = self.vk_token
         params['v'] = self.VK_API_VERSION
-        url = f"{self.VK_API_BASE}/{method}"
-        response = requests.post(url, data=params, timeout=10)
+        url = self._method_urls.get(method)
+        if url is None:
+            url = self._method_urls.setdefault(method, f"{self.VK_API_BASE}/{method}")
+        response = self._post_api(url, params, timeout=10)
         result = response.json()
         if 'error' in result:
             raise Exception(f"VK API error: {result['error']}")
@@ -125,297 +415,464 @@ class DiscoVKBot:
         if not self.enabled:
             return False
         if not self.notifications_enabled:
-            print("[VK Bot] Уведомления отключены в конфиге")
+            logger.info("[VK Bot] Уведомления отключены в конфиге")
             return False
 
         # Убираем HTML-теги из сообщения (VK не поддерживает HTML)
         clean_message = self._strip_html(message)
+        # Общая для всех получателей часть тела запроса кодируется один раз на рассылку
+        body_prefix = urlencode({
+            'access_token': self.vk_token,
+            'v': self.VK_API_VERSION,
+            'message': clean_message,
+        })
+
+        return self._broadcast(
+            lambda peer_id: self._send_message_to_peer(peer_id, body_prefix, max_retries, base_timeout)
+        )
 
-        success = False
-        for peer_id in self.peer_ids:
-            for attempt in range(max_retries):
-                try:
-                    current_timeout = base_timeout * (2 ** attempt)
-                    if attempt > 0:
-                        print(f"[VK Bot] Попытка {attempt + 1}/{max_retries} отправки в {peer_id}")
-
-                    params = {
-                        'access_token': self.vk_token,
-                        'v': self.VK_API_VERSION,
-                        'peer_id': peer_id,
-                        'message': clean_message,
-                        'random_id': random.randint(1, 2**31),
-                    }
-                    resp = requests.post(
-                        f"{self.VK_API_BASE}/messages.send",
-                        data=params,
-                        timeout=current_timeout
-                    )
-                    result = resp.json()
-
-                    if 'error' in result:
-                        print(f"[VK Bot] Ошибка отправки в {peer_id}: {result['error']}")
-                        error_code = result['error'].get('error_code', 0)
-                        # Не повторяем при ошибках доступа
-                        if error_code in (7, 15, 901, 917):
-                            break
-                    else:
-                        success = True
-                        print(f"[VK Bot] Сообщение отправлено в {peer_id}")
-                        break
+    def _send_message_to_peer(self, peer_id, body_prefix, max_retries, base_timeout):
+        """Отправка текстового сообщения одному получателю с повторами"""
+        for attempt in range(max_retries):
+            try:
+                current_timeout = base_timeout * (1 << attempt)
+                if attempt > 0:
+                    logger.info("[VK Bot] Попытка %s/%s отправки в %s", attempt + 1, max_retries, peer_id)
+
+                # peer_id (int, см. _normalize_ids/add_chat_id) и random_id не требуют экранирования
+                body = f"{body_prefix}&peer_id={peer_id}&random_id={random.randint(1, 2**31)}".encode('ascii')
+                resp = self._post_api(self.VK_MESSAGES_SEND_URL, body, timeout=current_timeout)
+                if resp.status_code == 429:
+                    # Сервер просит подождать — ждем указанное в Retry-After время и повторяем
+                    delay = self._retry_after_delay(resp, attempt)
+                    logger.warning("[VK Bot] HTTP 429 при отправке в %s, повтор через %.1f с", peer_id, delay)
+                    if attempt < max_retries - 1 and not self._wait_before_retry(delay):
+                        return False
+                    continue
+                if resp.status_code >= 500:
+                    # Временная ошибка сервера ВК — повторяем (503 может прийти с Retry-After)
+                    logger.warning("[VK Bot] HTTP %s при отправке в %s", resp.status_code, peer_id)
+                    if attempt < max_retries - 1 and not self._wait_before_retry(self._retry_after_delay(resp, attempt)):
+                        return False
+                    continue
+                result = resp.json()
+
+                if 'error' in result:
+                    logger.warning("[VK Bot] Ошибка отправки в %s: %s", peer_id, result['error'])
+                    error_code = result['error'].get('error_code', 0)
+                    self._record_peer_result(peer_id, error_code)
+                    # Повторяем только временные ошибки (доступ, параметры и т.п. не исправятся сами)
+                    if error_code not in self.VK_RETRIABLE_ERRORS:
+                        return False
+                    if attempt < max_retries - 1 and not self._wait_before_retry(self._backoff_delay(attempt)):
+                        return False
+                else:
+                    logger.info("[VK Bot] Сообщение отправлено в %s", peer_id)
+                    self._record_peer_result(peer_id)
+                    return True
+
+            except (Timeout, ConnectionError) as e:
+                if attempt < max_retries - 1:
+                    logger.warning("[VK Bot] Сетевая ошибка для %s: %s", peer_id, e)
+                    if not self._wait_before_retry(self._backoff_delay(attempt)):
+                        return False
+                else:
+                    logger.warning("[VK Bot] Не удалось отправить в %s после %s попыток: %s", peer_id, max_retries, e)
+            except VKUnavailableError as e:
+                logger.warning("[VK Bot] %s: %s", e, peer_id)
+                return False
+            except Exception as e:
+                logger.error("[VK Bot] Неожиданная ошибка при отправке в %s: %s", peer_id, e)
+                return False
 
-                except (Timeout, ConnectionError) as e:
-                    if attempt < max_retries - 1:
-                        wait_time = 2 ** attempt
-                        print(f"[VK Bot] Сетевая ошибка для {peer_id}: {e}")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"[VK Bot] Не удалось отправить в {peer_id} после {max_retries} попыток: {e}")
-                except Exception as e:
-                    print(f"[VK Bot] Неожиданная ошибка при отправке в {peer_id}: {e}")
-                    break
+        return False
 
-        return success
+    def _wait_before_retry(self, delay):
+        """Пауза перед повтором; False — бот закрывается (close), повторять не нужно"""
+        return not self._closing.wait(delay)
+
+    def _retry_after_delay(self, response, attempt):
+        """Задержка по заголовку Retry-After (в секундах), иначе — обычная экспоненциальная"""
+        try:
+            return min(self.RETRY_AFTER_CAP, max(0.0, float(response.headers.get('Retry-After'))))
+        except (TypeError, ValueError):
+            return self._backoff_delay(attempt)
+
+    def _backoff_delay(self, attempt):
+        """Задержка перед повтором: случайная в [0, min(cap, base * 2^attempt)] (full jitter)"""
+        return random.uniform(0, min(self.RETRY_BACKOFF_CAP, self.RETRY_BACKOFF_BASE * (1 << attempt)))
+
+    def _active_peer_ids(self):
+        """Получатели рассылки без тех, что находятся в карантине"""
+        if not self._quarantined_peers:
+            return list(self.peer_ids)
+        return [peer_id for peer_id in self.peer_ids if peer_id not in self._quarantined_peers]
+
+    def _record_peer_result(self, peer_id, error_code=None):
+        """
+        Учитывает результат отправки получателю: успех сбрасывает счетчик ошибок,
+        PEER_QUARANTINE_THRESHOLD постоянных ошибок подряд отправляют его в карантин
+        """
+        with self._peer_state_lock:
+            if error_code is None:
+                self._peer_failures.pop(peer_id, None)
+                return
+            if error_code not in self.VK_PEER_PERMANENT_ERRORS:
+                return
+            failures = self._peer_failures.get(peer_id, 0) + 1
+            self._peer_failures[peer_id] = failures
+            if failures >= self.PEER_QUARANTINE_THRESHOLD and peer_id not in self._quarantined_peers:
+                self._quarantined_peers.add(peer_id)
+                logger.warning("[VK Bot] Получатель %s пропускается в рассылках: ошибка доступа %s повторяется",
+                               peer_id, error_code)
+
+    def _release_peer(self, peer_id):
+        """Снимает карантин с получателя (например, когда он снова пишет боту)"""
+        with self._peer_state_lock:
+            self._peer_failures.pop(peer_id, None)
+            if peer_id in self._quarantined_peers:
+                self._quarantined_peers.discard(peer_id)
+                logger.info("[VK Bot] Получатель %s снова получает рассылки", peer_id)
+
+    def _broadcast(self, send_one):
+        """
+        Отправка всем получателям: при нескольких peer_id — параллельно в пуле потоков
+
+        Args:
+            send_one (callable): Отправка одному peer_id, возвращает True при успехе
+
+        Returns:
+            bool: True если отправка удалась хотя бы одному получателю
+        """
+        peer_ids = self._active_peer_ids()
+        if len(peer_ids) <= 1:
+            return any([send_one(peer_id) for peer_id in peer_ids])
+        try:
+            return any(list(self._send_pool.map(send_one, peer_ids)))
+        except RuntimeError:
+            # Пул уже закрыт в close() — рассылка не выполняется
+            logger.warning("[VK Bot] Рассылка пропущена: бот закрывается")
+            return False
 
     def send_photo(self, image_path, caption=None, parse_mode=None, max_retries=3, base_timeout=30):
         """Отправка изображения в ВК с подписью"""
         if not self.enabled or not self.notifications_enabled:
             return False
-        if not image_path or not os.path.exists(image_path):
-            print(f"[VK Bot] Файл изображения не найден: {image_path}")
+        photos = self._read_photos([image_path])
+        if not photos:
             return False
 
-        success = False
-        for peer_id in self.peer_ids:
-            for attempt in range(max_retries):
-                try:
-                    current_timeout = base_timeout * (2 ** attempt)
-                    # 1. Получаем URL для загрузки
-                    upload_server = self._vk_api(
-                        'photos.getMessagesUploadServer',
-                        peer_id=peer_id
-                    )
-                    upload_url = upload_server['upload_url']
-
-                    # 2. Загружаем файл
-                    with open(image_path, 'rb') as f:
-                        upload_resp = requests.post(
-                            upload_url,
-                            files={'photo': f},
-                            timeout=current_timeout
-                        ).json()
-
-                    # 3. Сохраняем фото
-                    saved = self._vk_api(
-                        'photos.saveMessagesPhoto',
-                        photo=upload_resp['photo'],
-                        server=upload_resp['server'],
-                        hash=upload_resp['hash']
-                    )
-                    photo = saved[0]
-                    attachment = f"photo{photo['owner_id']}_{photo['id']}"
-                    if photo.get('access_key'):
-                        attachment += f"_{photo['access_key']}"
-
-                    # 4. Отправляем сообщение с фото
-                    clean_caption = self._strip_html(caption) if caption else ''
-                    params = {
-                        'access_token': self.vk_token,
-                        'v': self.VK_API_VERSION,
-                        'peer_id': peer_id,
-                        'message': clean_caption,
-                        'attachment': attachment,
-                        'random_id': random.randint(1, 2**31),
-                    }
-                    resp = requests.post(
-                        f"{self.VK_API_BASE}/messages.send",
-                        data=params,
-                        timeout=current_timeout
-                    ).json()
-
-                    if 'error' not in resp:
-                        success = True
-                        print(f"[VK Bot] Фото отправлено в {peer_id}")
-                        break
-                    else:
-                        print(f"[VK Bot] Ошибка отправки фото в {peer_id}: {resp['error']}")
-                        break
-
-                except (Timeout, ConnectionError) as e:
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                    else:
-                        print(f"[VK Bot] Не удалось отправить фото в {peer_id}: {e}")
-                except Exception as e:
-                    print(f"[VK Bot] Ошибка при отправке фото в {peer_id}: {e}")
-                    break
-
-        return success
+        base_params = self._message_base_params(caption)
+        return self._broadcast(
+            lambda peer_id: self._send_photos_to_peer(peer_id, photos, base_params,
+                                                      max_retries, base_timeout, 'фото')
+        )
 
     def send_media_group(self, image_paths, caption=None, parse_mode=None, max_retries=3, base_timeout=60):
         """Отправка нескольких изображений одним сообщением"""
         if not self.enabled or not self.notifications_enabled:
             return False
 
-        valid_paths = [p for p in (image_paths or []) if p and os.path.exists(p)]
-        if not valid_paths:
+        photos = self._read_photos(image_paths or [])
+        if not photos:
             return False
 
-        success = False
-        for peer_id in self.peer_ids:
-            for attempt in range(max_retries):
-                try:
-                    current_timeout = base_timeout * (2 ** attempt)
-                    attachments = []
-
-                    for path in valid_paths:
-                        upload_server = self._vk_api(
-                            'photos.getMessagesUploadServer',
-                            peer_id=peer_id
-                        )
-                        with open(path, 'rb') as f:
-                            upload_resp = requests.post(
-                                upload_server['upload_url'],
-                                files={'photo': f},
-                                timeout=current_timeout
-                            ).json()
-
-                        saved = self._vk_api(
-                            'photos.saveMessagesPhoto',
-                            photo=upload_resp['photo'],
-                            server=upload_resp['server'],
-                            hash=upload_resp['hash']
-                        )
-                        photo = saved[0]
-                        att = f"photo{photo['owner_id']}_{photo['id']}"
-                        if photo.get('access_key'):
-                            att += f"_{photo['access_key']}"
-                        attachments.append(att)
-
-                    clean_caption = self._strip_html(caption) if caption else ''
-                    params = {
-                        'access_token': self.vk_token,
-                        'v': self.VK_API_VERSION,
-                        'peer_id': peer_id,
-                        'message': clean_caption,
-                        'attachment': ','.join(attachments),
-                        'random_id': random.randint(1, 2**31),
-                    }
-                    resp = requests.post(
-                        f"{self.VK_API_BASE}/messages.send",
-                        data=params,
-                        timeout=current_timeout
-                    ).json()
+        base_params = self._message_base_params(caption)
+        return self._broadcast(
+            lambda peer_id: self._send_photos_to_peer(peer_id, photos, base_params,
+                                                      max_retries, base_timeout, 'media group')
+        )
 
-                    if 'error' not in resp:
-                        success = True
-                        print(f"[VK Bot] Media group отправлена в {peer_id}")
-                        break
-                    else:
-                        print(f"[VK Bot] Ошибка отправки media group в {peer_id}: {resp['error']}")
-                        break
+    def _message_base_params(self, caption):
+        """Общие для всех получателей параметры messages.send (собираются один раз на рассылку)"""
+        return {
+            'access_token': self.vk_token,
+            'v': self.VK_API_VERSION,
+            'message': self._strip_html(caption) if caption else '',
+        }
 
-                except (Timeout, ConnectionError) as e:
-                    if attempt < max_retries - 1:
-                        time.sleep(2 ** attempt)
-                    else:
-                        print(f"[VK Bot] Не удалось отправить media group в {peer_id}: {e}")
-                except Exception as e:
-                    print(f"[VK Bot] Ошибка при отправке media group в {peer_id}: {e}")
-                    break
+    @staticmethod
+    def _read_photos(paths):
+        """
+        Читает изображения один раз для всех получателей: список (имя файла, содержимое).
+        Отсутствующие файлы пропускаются (без отдельной проверки os.path.exists перед open).
+        """
+        photos = []
+        for path in paths:
+            if not path:
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    photos.append((os.path.basename(path), f.read()))
+            except (FileNotFoundError, IsADirectoryError):
+                logger.warning("[VK Bot] Файл изображения не найден: %s", path)
+        return photos
+
+    def _upload_photo(self, peer_id, photo, timeout):
+        """Загружает изображение на сервер ВК и возвращает строку вложения для messages.send"""
+        # 1. Получаем URL для загрузки
+        upload_server = self._vk_api(
+            'photos.getMessagesUploadServer',
+            peer_id=peer_id
+        )
+        # 2. Загружаем файл
+        upload_resp = self._get_session().post(
+            upload_server['upload_url'],
+            files={'photo': photo},
+            timeout=timeout
+        ).json()
+        # 3. Сохраняем фото
+        saved = self._vk_api(
+            'photos.saveMessagesPhoto',
+            photo=upload_resp['photo'],
+            server=upload_resp['server'],
+            hash=upload_resp['hash']
+        )
+        saved_photo = saved[0]
+        attachment = f"photo{saved_photo['owner_id']}_{saved_photo['id']}"
+        if saved_photo.get('access_key'):
+            attachment += f"_{saved_photo['access_key']}"
+        return attachment
+
+    def _send_photos_to_peer(self, peer_id, photos, base_params, max_retries, base_timeout, label):
+        """Загрузка изображений и отправка их одним сообщением одному получателю с повторами"""
+        for attempt in range(max_retries):
+            try:
+                current_timeout = base_timeout * (1 << attempt)
+                attachments = [self._upload_photo(peer_id, photo, current_timeout) for photo in photos]
+
+                # 4. Отправляем сообщение с вложениями
+                params = {
+                    **base_params,
+                    'peer_id': peer_id,
+                    'attachment': ','.join(attachments),
+                    'random_id': random.randint(1, 2**31),
+                }
+                response = self._post_api(self.VK_MESSAGES_SEND_URL, params, timeout=current_timeout)
+                if response.status_code == 429 or response.status_code >= 500:
+                    delay = self._retry_after_delay(response, attempt)
+                    logger.warning("[VK Bot] HTTP %s при отправке %s в %s, повтор через %.1f с",
+                                   response.status_code, label, peer_id, delay)
+                    if attempt < max_retries - 1 and not self._wait_before_retry(delay):
+                        return False
+                    continue
+                resp = response.json()
+
+                if 'error' not in resp:
+                    logger.info("[VK Bot] Отправлено (%s) в %s", label, peer_id)
+                    self._record_peer_result(peer_id)
+                    return True
+                logger.warning("[VK Bot] Ошибка отправки %s в %s: %s", label, peer_id, resp['error'])
+                self._record_peer_result(peer_id, resp['error'].get('error_code', 0))
+                return False
+
+            except (Timeout, ConnectionError) as e:
+                if attempt < max_retries - 1:
+                    if not self._wait_before_retry(self._backoff_delay(attempt)):
+                        return False
+                else:
+                    logger.warning("[VK Bot] Не удалось отправить %s в %s: %s", label, peer_id, e)
+            except Exception as e:
+                logger.warning("[VK Bot] Ошибка при отправке %s в %s: %s", label, peer_id, e)
+                return False
 
-        return success
+        return False
 
     # ============================================
     # Уведомления
     # ============================================
 
-    def notify_disco_started(self, playlist=None, start_time=None):
-        """Уведомление о начале дискотеки"""
-        now = datetime.now()
-        message_lines = [
-            "Дискотека началась!\n",
-            f"Время: {now.strftime('%d.%m.%Y %H:%M')}\n",
-            "Музыка запущена"
-        ]
-        base_message = "\n".join(message_lines)
-        success = self.send_message(base_message)
+    def _is_duplicate_notification(self, kind, message):
+        """
+        Проверяет, отправлялось ли такое же уведомление недавно (защита от «дребезга»
+        монитора звука). Если нет — запоминает его как последнее для своего типа.
+        """
+        now = time.monotonic()
+        with self._notify_lock:
+            last = self._last_notifications.get(kind)
+            if last and last[1] == message and now - last[0] < self.NOTIFY_DEBOUNCE_INTERVAL:
+                return True
+            self._last_notifications[kind] = (now, message)
+            return False
+
+    def _notifications_active(self):
+        """Можно ли отправлять уведомления (проверяется до сборки текста уведомления)"""
+        if not self.enabled:
+            return False
+        if not self.notifications_enabled:
+            logger.info("[VK Bot] Уведомления отключены в конфиге")
+            return False
+        return True
+
+    def _enqueue_message(self, message, kind=None):
+        """
+        Ставит текстовое сообщение в очередь фоновой отправки
+
+        Args:
+            message (str): Текст сообщения
+            kind (str): Тип уведомления; из нескольких ожидающих уведомлений одного типа
+                отправляется только последнее. None — сообщение отправляется всегда
+
+        Returns:
+            bool: True если сообщение принято в очередь
+        """
+        if not self._notifications_active():
+            return False
+        if self._notify_thread is None:
+            with self._notify_lock:
+                if self._notify_thread is None:
+                    self._notify_thread = threading.Thread(target=self._notify_worker, daemon=True,
+                                                           name='VKNotify')
+                    self._notify_thread.start()
+        try:
+            self._notify_queue.put_nowait((kind, message))
+            return True
+        except queue.Full:
+            logger.warning("[VK Bot] Очередь уведомлений переполнена, сообщение отброшено")
+            return False
+
+    def _notify_worker(self):
+        """
+        Фоновый поток: забирает из очереди всё накопившееся (до NOTIFY_BATCH_SIZE),
+        схлопывает повторы и отправляет оставшиеся сообщения по порядку
+        """
+        while True:
+            batch = [self._notify_queue.get()]
+            while len(batch) < self.NOTIFY_BATCH_SIZE:
+                try:
+                    batch.append(self._notify_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                messages = self._coalesce_notifications(batch)
+                if len(messages) < len(batch) - batch.count(None):
+                    logger.info("[VK Bot] Схлопнуто уведомлений: %s", len(batch) - batch.count(None) - len(messages))
+                for message in messages:
+                    if self._closing.is_set():
+                        break
+                    try:
+                        self.send_message(message)
+                    except Exception as e:
+                        logger.warning("[VK Bot] Ошибка фоновой отправки уведомления: %s", e)
+            finally:
+                for _ in batch:
+                    self._notify_queue.task_done()
+            if None in batch or self._closing.is_set():
+                return
+
+    @staticmethod
+    def _coalesce_notifications(batch):
+        """
+        Оставляет из пачки только последнее уведомление каждого типа
+        (сообщения без типа сохраняются все), сохраняя порядок отправки
+        """
+        latest = {}
+        for index, item in enumerate(batch):
+            if item is None:
+                continue
+            kind, message = item
+            latest[index if kind is None else kind] = (index, message)
+        return [message for _, message in sorted(latest.values())]
+
+    def flush(self, timeout=None):
+        """
+        Ожидает отправки всех уведомлений из очереди
+
+        Returns:
+            bool: True если очередь опустела до истечения timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._notify_queue.all_tasks_done:
+            while self._notify_queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._notify_queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _notify(self, kind, message):
+        """Ставит уведомление в очередь, пропуская повторы в пределах NOTIFY_DEBOUNCE_INTERVAL"""
+        if self._is_duplicate_notification(kind, message):
+            logger.info("[VK Bot] Повторное уведомление '%s' пропущено", kind)
+            return False
+        return self._enqueue_message(message, kind)
+
+    def _format_time(self, now=None):
+        """Время события для текста уведомления (без now — текущее, через time.strftime)"""
+        if now is None:
+            return time.strftime(self.DATETIME_FORMAT)
+        return now.strftime(self.DATETIME_FORMAT)
+
+    def notify_disco_started(self, playlist=None, start_time=None, now=None):
+        """Уведомление о начале дискотеки (now — момент события, если уже известен вызывающему)"""
+        if not self._notifications_active():
+            return False
+        message = self.MSG_DISCO_STARTED.format(time=self._format_time(now))
+        if self._is_duplicate_notification('disco_started', message):
+            logger.info("[VK Bot] Повторное уведомление 'disco_started' пропущено")
+            return False
+        success = self._enqueue_message(message)
 
         if playlist and len(playlist) > 0:
-            print(f"[VK Bot] Отправка плейлиста: {len(playlist)} треков")
+            logger.info("[VK Bot] Отправка плейлиста: %s треков", len(playlist))
             playlist_lines = ["Плейлист на сегодня:\n"]
-            max_message_length = 4000
+            current_length = len(playlist_lines[0])  # Длина текущей части без повторной склейки строк
 
-            current_time = None
-            if start_time:
-                today = datetime.now().date()
-                current_time = datetime.combine(today, start_time)
-            else:
-                current_time = now
+            # Время начала трека ведется в секундах от полуночи: формат ЧЧ:ММ без strftime на каждый трек
+            start = start_time or (now or datetime.now()).time()
+            seconds_of_day = start.hour * 3600 + start.minute * 60 + start.second
 
             for track_path in playlist:
                 track_duration = 0
                 try:
-                    audio = MP3(track_path)
-                    track_duration = int(audio.info.length)
+                    track_duration = get_track_duration(track_path)
                 except Exception:
                     track_duration = 180
 
-                time_str = current_time.strftime('%H:%M')
+                hours, minutes = divmod(seconds_of_day // 60, 60)
+                time_str = f"{hours % 24:02d}:{minutes:02d}"
                 track_name = os.path.splitext(os.path.basename(track_path))[0]
                 track_line = f"{time_str} - {track_name}\n"
 
-                current_length = len("".join(playlist_lines))
-                if current_length + len(track_line) > max_message_length and len(playlist_lines) > 1:
+                if current_length + len(track_line) > self.VK_MESSAGE_MAX_LENGTH and len(playlist_lines) > 1:
                     playlist_message = "".join(playlist_lines).rstrip()
-                    self.send_message(playlist_message)
-                    time.sleep(0.5)
+                    self._enqueue_message(playlist_message)
                     playlist_lines = ["Плейлист (продолжение):\n"]
+                    current_length = len(playlist_lines[0])
 
                 playlist_lines.append(track_line)
-                current_time += timedelta(seconds=track_duration)
+                current_length += len(track_line)
+                seconds_of_day += track_duration
 
             if len(playlist_lines) > 1:
-                time.sleep(0.5)
                 playlist_message = "".join(playlist_lines).rstrip()
-                self.send_message(playlist_message)
-                success = True
+                success = self._enqueue_message(playlist_message) or success
 
         return success
 
-    def notify_disco_stopped(self):
+    def notify_disco_stopped(self, now=None):
         """Уведомление о завершении дискотеки"""
-        now = datetime.now()
-        message = (
-            f"Дискотека завершена\n\n"
-            f"Время: {now.strftime('%d.%m.%Y %H:%M')}\n"
-            f"До встречи!"
-        )
-        return self.send_message(message)
+        if not self._notifications_active():
+            return False
+        return self._notify('disco_stopped', self.MSG_DISCO_STOPPED.format(time=self._format_time(now)))
 
     def notify_music_stopped(self, silence_time):
         """Уведомление об остановке музыки (тишина)"""
-        message = (
-            f"Музыка перестала играть!\n\n"
-            f"Тишина: {silence_time:.0f} секунд"
-        )
-        return self.send_message(message)
+        if not self._notifications_active():
+            return False
+        return self._notify('music_stopped', self.MSG_MUSIC_STOPPED.format(silence=silence_time))
 
-    def notify_music_restored(self, silence_duration):
-        """Уведомление о восстановлении музыки"""
-        message = "Звук есть\n\nВсе хорошо"
-        return self.send_message(message)
+    def notify_music_restored(self, silence_duration=None):
+        """Уведомление о восстановлении музыки (silence_duration не используется, оставлен для совместимости)"""
+        if not self._notifications_active():
+            return False
+        return self._notify('music_restored', self.MSG_MUSIC_RESTORED)
 
-    def notify_server_started(self):
+    def notify_server_started(self, now=None):
         """Уведомление о запуске/перезагрузке сервера"""
-        now = datetime.now()
-        message = (
-            f"Сервер перезагружен\n\n"
-            f"Время: {now.strftime('%d.%m.%Y %H:%M')}\n"
-            f"Система планировщика активна\n"
-            f"Готов к работе!"
-        )
-        return self.send_message(message)
+        if not self._notifications_active():
+            return False
+        return self._notify('server_started', self.MSG_SERVER_STARTED.format(time=self._format_time(now)))
 
     # ============================================
     # Управление подписчиками
@@ -423,29 +880,64 @@ class DiscoVKBot:
 
     def add_chat_id(self, peer_id):
         """Добавление нового peer_id в список получателей"""
-        if peer_id not in self.peer_ids:
+        peer_id = int(peer_id)
+        if peer_id not in self._peer_id_set:
+            self._peer_id_set.add(peer_id)
             self.peer_ids.append(peer_id)
-            self.save_config()
-            print(f"[VK Bot] Добавлен получатель: {peer_id}")
+            self._schedule_save_config()
+            logger.info("[VK Bot] Добавлен получатель: %s", peer_id)
             return True
         return False
 
     def remove_chat_id(self, peer_id):
         """Удаление peer_id из списка получателей"""
-        if peer_id in self.peer_ids:
+        peer_id = int(peer_id)
+        if peer_id in self._peer_id_set:
+            self._peer_id_set.discard(peer_id)
             self.peer_ids.remove(peer_id)
-            self.save_config()
-            print(f"[VK Bot] Удален получатель: {peer_id}")
+            self._schedule_save_config()
+            logger.info("[VK Bot] Удален получатель: %s", peer_id)
             return True
         return False
 
+    def add_chat_ids(self, peer_ids):
+        """
+        Добавление нескольких получателей с одной записью конфига
+
+        Returns:
+            int: Количество добавленных получателей
+        """
+        added = sum(1 for peer_id in peer_ids if self.add_chat_id(peer_id))
+        self.flush_config()
+        return added
+
+    def _schedule_save_config(self):
+        """Помечает конфиг измененным и (пере)запускает таймер отложенной записи"""
+        with self._save_timer_lock:
+            self._config_dirty = True
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.CONFIG_SAVE_DELAY, self.flush_config)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush_config(self):
+        """Немедленно записывает отложенные изменения конфига, если они есть"""
+        with self._save_timer_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._config_dirty:
+                return
+            self._config_dirty = False
+        self.save_config()
+
     def save_config(self):
         """Сохранение конфигурации в файл (потокобезопасно через общий lock)"""
         def _do_save():
             try:
                 if os.path.exists(self.config_file):
-                    with open(self.config_file, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
+                    config = self._read_config()
 
                     config['vk_group_token'] = self.vk_token
                     config['vk_peer_ids'] = self.peer_ids
@@ -453,13 +945,18 @@ class DiscoVKBot:
 
                     # Атомарная запись через временный файл
                     temp_file = self.config_file + '.tmp'
-                    with open(temp_file, 'w', encoding='utf-8') as f:
-                        json.dump(config, f, indent=2, ensure_ascii=False)
+                    with open(temp_file, 'wb') as f:
+                        f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
                     os.replace(temp_file, self.config_file)
+                    # Кэш соответствует только что записанному файлу
+                    stat = os.stat(self.config_file)
+                    self._config_version = (stat.st_mtime_ns, stat.st_size)
 
                     self.enabled = bool(self.vk_token)
             except Exception as e:
-                print(f"[VK Bot] Ошибка при сохранении конфигурации: {e}")
+                logger.warning("[VK Bot] Ошибка при сохранении конфигурации: %s", e)
+                # Кэш мог разойтись с файлом — при следующем обращении перечитаем
+                self._config_cache = None
                 temp_file = self.config_file + '.tmp'
                 if os.path.exists(temp_file):
                     try:
@@ -476,21 +973,21 @@ class DiscoVKBot:
     def enable_notifications(self):
         """Включить уведомления"""
         if not self.enabled:
-            print("[VK Bot] Бот не активирован!")
+            logger.warning("[VK Bot] Бот не активирован!")
             return False
         self.notifications_enabled = True
-        self.save_config()
-        print("[VK Bot] Уведомления включены")
+        self._schedule_save_config()
+        logger.info("[VK Bot] Уведомления включены")
         return True
 
     def disable_notifications(self):
         """Отключить уведомления"""
         if not self.enabled:
-            print("[VK Bot] Бот не активирован!")
+            logger.warning("[VK Bot] Бот не активирован!")
             return False
         self.notifications_enabled = False
-        self.save_config()
-        print("[VK Bot] Уведомления отключены")
+        self._schedule_save_config()
+        logger.info("[VK Bot] Уведомления отключены")
         return True
 
     def toggle_notifications(self):
@@ -527,10 +1024,12 @@ class DiscoVKBot:
         from_id = event.get('from_id', 0)
         peer_id = event.get('peer_id', 0)
 
-        print(f"[VK Bot] Сообщение от {from_id} в {peer_id}: '{text}'")
+        logger.info("[VK Bot] Сообщение от %s в %s: '%s'", from_id, peer_id, text)
+        # Раз сообщение пришло, доступ к беседе снова есть
+        self._release_peer(peer_id)
 
         # Если пишут в ЛС группе — автоматически подписываем на уведомления
-        if peer_id > 0 and peer_id not in self.peer_ids:
+        if peer_id > 0 and peer_id not in self._peer_id_set:
             self.add_chat_id(peer_id)
             self._send_to_peer(peer_id, "Вы подписаны на уведомления дискотеки! Напишите 'команды' для списка команд.")
 
@@ -544,7 +1043,7 @@ class DiscoVKBot:
             self._send_to_peer(peer_id, help_text)
 
         elif text in ('отписаться', 'отписка', 'стоп', '/stop'):
-            if peer_id in self.peer_ids:
+            if peer_id in self._peer_id_set:
                 self.remove_chat_id(peer_id)
                 self._send_to_peer(peer_id, "Вы отписаны от уведомлений. Напишите что угодно, чтобы подписаться снова.")
             else:
@@ -556,7 +1055,7 @@ class DiscoVKBot:
             if success:
                 url_ok, url = self.run_tunnel_command('url')
                 if url_ok and url and url != "Информация о туннеле не найдена":
-                    response = f"Туннель перезапущен\n\nСсылка:\n{url}\n\nВремя: {datetime.now().strftime('%H:%M:%S')}"
+                    response = f"Туннель перезапущен\n\nСсылка:\n{url}\n\nВремя: {time.strftime('%H:%M:%S')}"
                 else:
                     response = "Туннель перезапущен, но URL не получен. Попробуйте через минуту."
             else:
@@ -574,7 +1073,7 @@ class DiscoVKBot:
                 random_id=random.randint(1, 2**31)
             )
         except Exception as e:
-            print(f"[VK Bot] Ошибка отправки в {peer_id}: {e}")
+            logger.warning("[VK Bot] Ошибка отправки в %s: %s", peer_id, e)
 
     def run_tunnel_command(self, command, mode=None):
         """Выполнить команду для управления туннелем"""
@@ -602,21 +1101,21 @@ class DiscoVKBot:
     def start_polling(self):
         """Запустить Long Poll с автовосстановлением"""
         if not self.enabled or not self.group_id:
-            print("[VK Bot] Бот не инициализирован или group_id не задан")
+            logger.warning("[VK Bot] Бот не инициализирован или group_id не задан")
             return
 
-        print("[VK Bot] Запуск Long Poll...")
+        logger.info("[VK Bot] Запуск Long Poll...")
         retry_delay = 10
         max_retry_delay = 300
 
         while True:
             try:
                 self._init_long_poll()
-                print("[VK Bot] Long Poll подключен, слушаю команды...")
+                logger.info("[VK Bot] Long Poll подключен, слушаю команды...")
                 retry_delay = 10  # Сбрасываем задержку при успешном подключении
 
                 while True:
-                    resp = requests.get(
+                    resp = self._get_session().get(
                         self._lp_server,
                         params={'act': 'a_check', 'key': self._lp_key, 'ts': self._lp_ts, 'wait': 25},
                         timeout=30
@@ -638,21 +1137,22 @@ class DiscoVKBot:
                                 self._handle_message(msg)
 
             except KeyboardInterrupt:
-                print("\n[VK Bot] Остановка по запросу пользователя...")
+                logger.info("[VK Bot] Остановка по запросу пользователя...")
                 break
             except Exception as e:
                 error_type = type(e).__name__
-                print(f"\n[VK Bot] Ошибка: {error_type}: {e}")
                 if "Connection" in str(e) or "Timeout" in str(e):
-                    print("[VK Bot] Проблема с интернет-соединением")
+                    logger.error("[VK Bot] Ошибка: %s: %s", error_type, e)
+                    logger.warning("[VK Bot] Проблема с интернет-соединением")
                 else:
-                    traceback.print_exc()
+                    # Непредвиденная ошибка — пишем вместе с трассировкой
+                    logger.exception("[VK Bot] Ошибка: %s: %s", error_type, e)
 
-                print(f"[VK Bot] Переподключение через {retry_delay} сек...")
+                logger.info("[VK Bot] Переподключение через %s сек...", retry_delay)
                 time.sleep(retry_delay)
                 retry_delay = min(retry_delay * 1.5, max_retry_delay)
 
-        print("[VK Bot] Бот остановлен")
+        logger.info("[VK Bot] Бот остановлен")
 
     # ============================================
     # Вспомогательные методы
@@ -667,7 +1167,7 @@ class DiscoVKBot:
 
     def is_admin(self, user_id):
         """Проверка, является ли пользователь администратором"""
-        return user_id in self.admin_users
+        return user_id in self._admin_user_set
 
 
 # Для совместимости — экспортируем под старым именем
@@ -676,6 +1176,8 @@ TelegramNotifier = DiscoVKBot
 
 def main():
     """Главная функция для запуска бота"""
+    # При автономном запуске сообщения бота выводятся в консоль
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     print("=== ВК-бот дискотеки ===\n")
     print("Функции:")
     print("  - Отправка уведомлений о событиях дискотеки")